@@ -0,0 +1,173 @@
+# benchmarks/bench_engine.py
+"""
+Engine throughput benchmark.
+
+Runs ZorkinatorEngine for a fixed number of graph steps per
+reasoner/evaluator/reflector combination against the mock Ollama server and
+reports steps/sec, p50/p99 time per node, peak RSS and the RSS growth slope.
+Each combination runs in a fresh process so memory figures do not bleed
+into each other.
+
+    python -m benchmarks.bench_engine -c config.yaml --steps 400 --out bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, List
+
+import numpy as np
+
+DEFAULT_COMBOS = [
+    ("RandomReasoner", "NullEvaluator", "NullReflector"),
+    ("RandomReasoner", "ScoreDeltaEvaluator", "NullReflector"),
+    ("LLMReasonerNoValids", "NullEvaluator", "NullReflector"),
+    ("LLMReasonerNoValids", "LLMEvaluator", "LLMReflector"),
+    ("LLMReasoner", "ScoreDeltaEvaluator", "LLMReflector"),
+]
+
+
+def _current_rss() -> int:
+    """Resident set size in bytes (Linux /proc; falls back to peak RSS)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    arr = np.asarray(samples) * 1000.0
+    return {
+        "count": int(arr.size),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "mean_ms": round(float(arr.mean()), 3),
+    }
+
+
+def bench_combo(cfg_dict: Dict[str, Any], combo, steps: int, latency: float,
+                token_latency: float, rss_every: int) -> Dict[str, Any]:
+    from omegaconf import OmegaConf
+    from benchmarks.mock_ollama import start_mock_server
+    from engine.instrumentation import Instrumentation
+    from run import build_client, build_engine
+
+    server, url = start_mock_server(latency, token_latency)
+    cfg = OmegaConf.create(cfg_dict)
+    cfg.reasoner, cfg.evaluator, cfg.reflector = combo
+    cfg.ollama_base_url = url
+
+    metrics = Instrumentation()
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = build_engine(
+            cfg, build_client(cfg, metrics=metrics), seed=0, watch_stdin=False, metrics=metrics
+        )
+
+    node_times: Dict[str, List[float]] = defaultdict(list)
+    rss_samples = [(0, _current_rss())]
+    sink = io.StringIO()
+    n = 0
+    start = last = time.perf_counter()
+    with contextlib.redirect_stdout(sink):
+        for update in engine.graph.stream(
+            engine.initial_state, {"recursion_limit": steps + 10}, stream_mode="updates"
+        ):
+            now = time.perf_counter()
+            for node in update:
+                node_times[node].append(now - last)
+            last = now
+            n += 1
+            if n % rss_every == 0:
+                rss_samples.append((n, _current_rss()))
+                sink.seek(0)
+                sink.truncate()
+            if n >= steps or any(v and v.get("done") for v in update.values()):
+                break
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    xs, ys = zip(*rss_samples)
+    slope = float(np.polyfit(xs, ys, 1)[0]) if len(xs) > 1 else 0.0
+    return {
+        "reasoner": combo[0],
+        "evaluator": combo[1],
+        "reflector": combo[2],
+        "steps": n,
+        "seconds": round(elapsed, 4),
+        "steps_per_sec": round(n / elapsed, 2) if elapsed else None,
+        "nodes": {node: _percentiles(ts) for node, ts in node_times.items()},
+        "llm": {k: v for k, v in metrics.snapshot()["timers"].items() if k.startswith("llm.")},
+        "counters": dict(metrics.counters),
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "rss_slope_bytes_per_step": round(slope, 2),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ZorkinatorEngine throughput offline")
+    parser.add_argument("--config-file", "-c", default="config.yaml")
+    parser.add_argument("--steps", type=int, default=400, help="Graph steps per combination")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock LLM latency before first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Mock LLM latency per token (s)")
+    parser.add_argument("--rss-every", type=int, default=20, help="Sample RSS every N steps")
+    parser.add_argument("--combo", action="append",
+                        help="Reasoner:Evaluator:Reflector (repeatable; default: built-in matrix)")
+    parser.add_argument("--engine-mode", choices=("graph", "native"),
+                        help="Override the config's engine_mode")
+    parser.add_argument("--out", help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    from omegaconf import OmegaConf
+    cfg_dict = OmegaConf.to_container(OmegaConf.load(args.config_file), resolve=True)
+    cfg_dict["llm_cache_size"] = 0
+    cfg_dict["llm_cache_path"] = None
+    if args.engine_mode:
+        cfg_dict["engine_mode"] = args.engine_mode
+
+    combos = [tuple(c.split(":")) for c in args.combo] if args.combo else DEFAULT_COMBOS
+    results = []
+    for combo in combos:
+        # fresh interpreter per combination keeps RSS figures independent
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            result = pool.submit(
+                bench_combo, cfg_dict, combo, args.steps,
+                args.latency, args.token_latency, args.rss_every
+            ).result()
+        print(f"[Bench] {':'.join(combo)}: {result['steps_per_sec']} steps/s, "
+              f"RSS slope {result['rss_slope_bytes_per_step']} B/step")
+        results.append(result)
+
+    report = {
+        "commit": _git_commit(),
+        "steps": args.steps,
+        "latency": args.latency,
+        "token_latency": args.token_latency,
+        "engine_mode": cfg_dict.get("engine_mode", "graph"),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/mock_ollama.py
+"""
+Local stand-in for the Ollama /api/generate endpoint.
+
+Answers with canned responses chosen from the prompt's trailing cue
+("Next command:", "Reward:", "Reflection:"), after a configurable delay, in
+either the plain or the streamed (NDJSON) response format.
+
+    python -m benchmarks.mock_ollama --port 11434 --latency 0.2
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+CANNED: Dict[str, List[str]] = {
+    "Next command:": ["north", "south", "east", "west", "open mailbox", "take leaflet", "look"],
+    "Reward:": ["0", "1", "-1"],
+    "Reflection:": ["The agent is exploring the area around the house.\nIt should try new directions."],
+}
+DEFAULT = ["look"]
+
+
+def canned_response(prompt: str, rng: random.Random) -> str:
+    tail = prompt.rstrip()
+    for cue, answers in CANNED.items():
+        if tail.endswith(cue):
+            return rng.choice(answers)
+    return rng.choice(DEFAULT)
+
+
+def make_handler(latency: float, token_latency: float, seed: int):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with lock:
+                text = canned_response(body.get("prompt", ""), rng)
+            tokens = text.split(" ")
+            time.sleep(latency)
+
+            if body.get("stream", True):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for i, tok in enumerate(tokens):
+                        time.sleep(token_latency)
+                        piece = tok if i == 0 else " " + tok
+                        self._chunk({"response": piece, "done": False})
+                    self._chunk(self._final("", len(tokens)))
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client stopped reading after the first line
+                return
+
+            time.sleep(token_latency * len(tokens))
+            payload = json.dumps(self._final(text, len(tokens))).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _final(self, text: str, n_tokens: int) -> dict:
+            return {
+                "response": text,
+                "done": True,
+                "eval_count": n_tokens,
+                "eval_duration": int(token_latency * n_tokens * 1e9),
+            }
+
+        def _chunk(self, obj: dict) -> None:
+            data = json.dumps(obj).encode() + b"\n"
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_mock_server(
+    latency: float = 0.0,
+    token_latency: float = 0.0,
+    port: int = 0,
+    seed: int = 0
+) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the server on a daemon thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, token_latency, seed))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock Ollama /api/generate server")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds per token")
+    args = parser.parse_args()
+    server, url = start_mock_server(args.latency, args.token_latency, args.port)
+    print(f"[MockOllama] serving on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Snap free-form LLM output to a command the game will accept.
+
+Models often answer "Next command: go north." or "> open the mailbox" where
+the game wants "north" / "open mailbox". Every such miss costs a game turn
+and another model call, so the raw first line goes through:
+
+  1. cleanup: precompiled regexes strip prompt echoes ("Next command:",
+     "> ", "I will ..."), quotes, markdown and trailing punctuation;
+  2. matching against the current valid actions: exact, then the longest
+     valid action that is a word-prefix of the reply (word trie), then a
+     fuzzy match (difflib ratio) among the valid actions with the same verb,
+     so a typo is fixed but "read leaflet" never turns into "take leaflet";
+  3. otherwise a check against the game's dictionary (env.get_dictionary(),
+     which stores words truncated to the Z-machine resolution), fuzzily
+     correcting unknown words one token at a time. Jericho's valid actions
+     leave out commands that do not change the world state ("look",
+     "inventory", "examine mailbox"), so a reply made of known words is
+     sent as is rather than re-prompted.
+
+Only when all of these fail is the model re-prompted, once.
+
+confident() reports whether a reply resolves without guessing (no fuzzy
+match or spelling correction); a CascadeClient uses it to decide when to
+escalate to a larger model.
+"""
+
+import difflib
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from engine.world_map import normalize_move
+
+_ECHO = re.compile(
+    r"^(?:>+|\*+|-+|\d+[.)])?\s*"
+    r"(?:(?:the\s+)?(?:next\s+)?(?:command|action|answer|response)\s*(?:is)?\s*[:\-]?\s*)?"
+    r"(?:i(?:\s+(?:will|would|should)|\s*['’]ll)\s+|let['’]?s\s+|you\s+should\s+)?",
+    re.IGNORECASE,
+)
+_QUOTES = re.compile(r"[`\"'‘’“”*_]+")
+_TRAILING = re.compile(r"[\s.!?,;:]+$")
+_SPACES = re.compile(r"\s+")
+_FILLER = frozenset(("the", "a", "an"))
+
+
+def clean(text: str) -> str:
+    """Lower-cased command text with echoes, quotes and punctuation removed."""
+    line = text.strip().splitlines()[0] if text.strip() else ""
+    line = _QUOTES.sub("", _ECHO.sub("", line, count=1))
+    return _SPACES.sub(" ", _TRAILING.sub("", line)).strip().lower()
+
+
+class _WordTrie:
+    """Word-level trie over a list of commands for longest-prefix lookup."""
+    __slots__ = ("root",)
+
+    def __init__(self, commands: Sequence[str]):
+        self.root: Dict = {}
+        for command in commands:
+            node = self.root
+            for word in command.lower().split():
+                node = node.setdefault(word, {})
+            node[None] = command
+
+    def longest_prefix(self, words: List[str]) -> Optional[str]:
+        node, best = self.root, None
+        for word in words:
+            node = node.get(word)
+            if node is None:
+                break
+            best = node.get(None, best)
+        return best
+
+
+class ActionParser:
+    """
+    Normalizes model replies into game commands and counts how each reply
+    was resolved (exact / prefix / fuzzy / vocabulary / corrected /
+    reprompts / failures).
+    """
+    def __init__(self, cutoff: float = 0.75):
+        self.cutoff = cutoff
+        self.counters: Counter = Counter()
+        self._vocab: Optional[set] = None
+        self._vocab_list: List[str] = []
+        self._word_len = 0
+        self._trie_key = None
+        self._trie: Optional[_WordTrie] = None
+        self._lowered: Dict[str, str] = {}
+        self._by_verb: Dict[str, List[str]] = {}
+
+    def resolve(
+        self, text: str, env=None, valid_actions: Optional[Sequence[str]] = None
+    ) -> Tuple[Optional[str], str]:
+        """(command or None, how it matched), without touching the counters."""
+        command = clean(text)
+        if not command:
+            return None, "empty"
+        if valid_actions:
+            found, kind = self._match_valid(command, valid_actions, env)
+            if found is not None:
+                return found, kind
+        if env is None:
+            return (None, "unmatched") if valid_actions else (command, "unchecked")
+        found, kind = self._match_vocabulary(command, env)
+        if valid_actions and kind == "unchecked":
+            # no dictionary to vouch for a command outside the valid actions
+            return None, "unmatched"
+        if kind == "corrected" and found in self._lowered:
+            return self._lowered[found], kind
+        return found, kind
+
+    def parse(self, text: str, env=None, valid_actions: Optional[Sequence[str]] = None) -> Optional[str]:
+        """The matching command, or None if nothing plausible was found."""
+        command, kind = self.resolve(text, env, valid_actions)
+        if command is not None and kind != "unchecked":
+            self.counters[kind] += 1
+        return command
+
+    def confident(self, text: str, env=None, valid_actions: Optional[Sequence[str]] = None) -> bool:
+        """True if the reply resolves exactly, by prefix or by vocabulary."""
+        command, kind = self.resolve(text, env, valid_actions)
+        return command is not None and kind not in ("fuzzy", "corrected")
+
+    def snap(
+        self,
+        text: str,
+        env=None,
+        valid_actions: Optional[Sequence[str]] = None,
+        reprompt: Optional[Callable[[str], str]] = None
+    ) -> str:
+        """
+        parse(), re-prompting once through `reprompt(bad_reply)` on failure.
+        If that fails too the cleaned reply is sent anyway (valid-action
+        lists are not exhaustive), or "look" if it is empty.
+        """
+        action = self.parse(text, env, valid_actions)
+        if action is None and reprompt is not None:
+            self.counters["reprompts"] += 1
+            text = reprompt(clean(text) or text.strip())
+            action = self.parse(text, env, valid_actions)
+        if action is None:
+            self.counters["failures"] += 1
+            return clean(text) or "look"
+        return action
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counters)
+
+    @staticmethod
+    def _state_key(env, valid_actions: Sequence[str]):
+        if env is not None:
+            try:
+                return env.get_world_state_hash()
+            except Exception:
+                pass
+        return tuple(valid_actions)
+
+    def _match_valid(self, command: str, valid_actions: Sequence[str], env=None) -> Tuple[Optional[str], str]:
+        key = self._state_key(env, valid_actions)
+        if key != self._trie_key:
+            # rebuilt only when the world state (and so its valid actions) changes
+            self._trie_key, self._trie = key, _WordTrie(valid_actions)
+            self._lowered = {a.lower(): a for a in valid_actions}
+            self._by_verb = {}
+            for lowered in self._lowered:
+                self._by_verb.setdefault(lowered.split(" ", 1)[0], []).append(lowered)
+        if command in self._lowered:
+            return self._lowered[command], "exact"
+        move = normalize_move(command)
+        if move is not None and move in self._lowered:
+            return self._lowered[move], "exact"
+        words = command.split()
+        found = self._trie.longest_prefix(words) or self._trie.longest_prefix(
+            [w for w in words if w not in _FILLER and w != "go"]
+        )
+        if found is not None:
+            return found, "prefix"
+        same_verb = self._by_verb.get(words[0], ())
+        close = difflib.get_close_matches(command, same_verb, n=1, cutoff=self.cutoff)
+        if close:
+            return self._lowered[close[0]], "fuzzy"
+        return None, "unmatched"
+
+    def _match_vocabulary(self, command: str, env) -> Tuple[Optional[str], str]:
+        if self._vocab is None:
+            try:
+                self._vocab_list = sorted({str(w).lower() for w in env.get_dictionary()})
+            except Exception:
+                self._vocab_list = []
+            self._vocab = set(self._vocab_list)
+            self._word_len = max(map(len, self._vocab_list), default=0)
+        if not self._vocab:
+            return command, "unchecked"
+        words, fixed = command.split(), False
+        for i, word in enumerate(words):
+            if word in _FILLER or word[:self._word_len] in self._vocab:
+                continue
+            close = difflib.get_close_matches(word[:self._word_len], self._vocab_list, n=1, cutoff=self.cutoff)
+            if not close:
+                return None, "unmatched"
+            words[i], fixed = close[0], True
+        return " ".join(words), "corrected" if fixed else "vocabulary"
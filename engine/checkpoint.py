@@ -0,0 +1,103 @@
+import glob
+import gzip
+import os
+import pickle
+import random
+from typing import Any, Dict, Optional
+
+CHECKPOINT_VERSION = 1
+# attributes that hold live resources, or references to other engine parts
+# that the engine re-binds after a restore, rather than learned state
+_SKIP_ATTRS = {"client", "evaluator", "trajectory"}
+
+
+def component_state(obj: Any) -> Dict[str, Any]:
+    """Picklable instance attributes of a component (its internal state)."""
+    state = {}
+    for name, value in vars(obj).items():
+        if name in _SKIP_ATTRS:
+            continue
+        try:
+            pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            continue
+        state[name] = value
+    return state
+
+
+def restore_component(obj: Any, state: Optional[Dict[str, Any]]) -> None:
+    if state:
+        vars(obj).update(state)
+
+
+class Checkpointer:
+    """
+    Periodic episode checkpoints.
+
+    Every `every` env steps (checked at the start of a turn, when the
+    previous turn is fully applied) the engine is written to
+    `directory/ckpt-<step>.pkl.gz`: FrotzEnv state via get_state(), the
+    AgentState, the bounded transcript, the picklable state of every
+    component (e.g. ScoreDeltaEvaluator._last_score) and Python's RNG state.
+    Files are written to a temporary name and renamed, so a crash never
+    leaves a torn checkpoint; only the newest `keep` are retained.
+    """
+    def __init__(self, directory: str, every: int = 1000, keep: int = 3):
+        self.directory = directory
+        self.every = every
+        self.keep = keep
+        self.last_step = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def due(self, env_steps: int) -> bool:
+        return env_steps - self.last_step >= self.every
+
+    def save(self, engine, state) -> str:
+        env_steps = int(engine.metrics.counters["env_steps"])
+        if engine.trajectory is not None:
+            # every record up to this point must be on disk to resume the log
+            engine.trajectory.flush()
+        payload = {
+            "version": CHECKPOINT_VERSION,
+            "env_steps": env_steps,
+            "graph_steps": engine.graph_steps,
+            "env_state": engine.env.get_state(),
+            "agent_state": dict(state),
+            "transcript": engine.transcript,
+            "reasoner": component_state(engine.reasoner),
+            "evaluator": component_state(engine.evaluator),
+            "reflector": component_state(engine.reflector),
+            "loop_breaker": component_state(engine.loop_breaker) if engine.loop_breaker else None,
+            "run_metrics": component_state(engine.run_metrics),
+            "counters": dict(engine.metrics.counters),
+            "trajectory_steps": engine.trajectory.steps_written if engine.trajectory else None,
+            "random": random.getstate(),
+        }
+        path = os.path.join(self.directory, f"ckpt-{env_steps:09d}.pkl.gz")
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wb", compresslevel=3) as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.last_step = env_steps
+
+        for old in sorted(glob.glob(os.path.join(self.directory, "ckpt-*.pkl.gz")))[:-self.keep]:
+            os.remove(old)
+        return path
+
+
+def latest_checkpoint(path: str) -> str:
+    """Resolve a checkpoint file, or the newest one inside a directory."""
+    if os.path.isdir(path):
+        found = sorted(glob.glob(os.path.join(path, "ckpt-*.pkl.gz")))
+        if not found:
+            raise FileNotFoundError(f"No checkpoints in {path}")
+        return found[-1]
+    return path
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    with gzip.open(latest_checkpoint(path), "rb") as f:
+        payload = pickle.load(f)
+    if payload.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {payload.get('version')}")
+    return payload
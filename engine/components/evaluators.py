@@ -1,5 +1,15 @@
-from typing import Protocol, List
-from utils.ollama import OllamaClient
+from __future__ import annotations
+
+import copy
+import hashlib
+from collections import ChainMap, OrderedDict, deque
+from typing import TYPE_CHECKING, Protocol, List
+from engine.loops import CycleDetector
+from engine.prompts import DEFAULT_BUDGETS, TAIL, compile_template
+from engine.transcript import Step
+
+if TYPE_CHECKING:
+    from utils.ollama import OllamaClient
 
 # ──────────────────────────────────────────────────────────────────────
 # Evaluator interface
@@ -7,10 +17,38 @@ from utils.ollama import OllamaClient
 class Evaluator(Protocol):
     """
     Computes an integer reward from the transcript of past turns.
+    `update` is the incremental form: it sees each Step once and keeps
+    whatever running state it needs, so a turn costs O(1).
+    Evaluators that can be used for simulation also provide `fork()`: an
+    evaluator whose updates do not affect this one, made without copying
+    the accumulated history.
     """
     def evaluate(self, transcript: List[str]) -> int:
         ...
 
+    def update(self, step: Step) -> int:
+        ...
+
+class _CountOverlay(ChainMap):
+    """Counter view for forks: writes go to the first map, missing keys count 0."""
+    def __missing__(self, key):
+        return 0
+
+
+def _fork_counts(counts) -> _CountOverlay:
+    return counts.new_child() if isinstance(counts, _CountOverlay) else _CountOverlay({}, counts)
+
+
+def _bump(counts, key, capacity: int) -> int:
+    """Increment a count; an OrderedDict keeps only the `capacity` most recent keys."""
+    count = counts.get(key, 0) + 1
+    counts[key] = count
+    if isinstance(counts, OrderedDict):
+        counts.move_to_end(key)
+        if len(counts) > capacity:
+            counts.popitem(last=False)
+    return count
+
 # ──────────────────────────────────────────────────────────────────────
 # 1. NullEvaluator
 # ──────────────────────────────────────────────────────────────────────
@@ -21,6 +59,12 @@ class NullEvaluator:
     def evaluate(self, transcript: List[str]) -> int:
         return 0
 
+    def update(self, step: Step) -> int:
+        return 0
+
+    def fork(self) -> "NullEvaluator":
+        return self
+
 # ──────────────────────────────────────────────────────────────────────
 # 2. ScoreDeltaEvaluator (text-based)
 # ──────────────────────────────────────────────────────────────────────
@@ -31,15 +75,23 @@ class ScoreDeltaEvaluator:
     """
     def __init__(self):
         self._last_score = 0
+        self._current = 0
+
+    @staticmethod
+    def _score_in_line(line: str) -> int | None:
+        lower = line.lower()
+        if 'point' in lower:
+            words = lower.split()
+            for i, w in enumerate(words):
+                if w.isdigit() and i+1 < len(words) and 'point' in words[i+1]:
+                    return int(w)
+        return None
 
     def _extract_score(self, transcript: List[str]) -> int:
         for line in reversed(transcript):
-            lower = line.lower()
-            if 'point' in lower:
-                words = lower.split()
-                for i, w in enumerate(words):
-                    if w.isdigit() and i+1 < len(words) and 'point' in words[i+1]:
-                        return int(w)
+            score = self._score_in_line(line)
+            if score is not None:
+                return score
         return 0
 
     def evaluate(self, transcript: List[str]) -> int:
@@ -48,6 +100,20 @@ class ScoreDeltaEvaluator:
         self._last_score = current
         return delta
 
+    def update(self, step: Step) -> int:
+        # only the new step can change the most recent score mention
+        for line in reversed(step.obs.splitlines()):
+            score = self._score_in_line(line)
+            if score is not None:
+                self._current = score
+                break
+        delta = self._current - self._last_score
+        self._last_score = self._current
+        return delta
+
+    def fork(self) -> "ScoreDeltaEvaluator":
+        return copy.copy(self)
+
 # ──────────────────────────────────────────────────────────────────────
 # 3. LoopPenaltyEvaluator
 # ──────────────────────────────────────────────────────────────────────
@@ -55,7 +121,23 @@ class LoopPenaltyEvaluator:
     """
     Penalizes repeating the same observation-action pair.
     Returns -1 if the last pair occurred before; otherwise 0.
+    update() remembers the `capacity` most recently seen pairs.
     """
+    def __init__(self, capacity: int = 100_000):
+        self.capacity = capacity
+        self._pair_counts: OrderedDict = OrderedDict()
+
+    def update(self, step: Step) -> int:
+        # same key as evaluate(): the action and the first line after it
+        first_line = step.obs.split("\n", 1)[0]
+        key = (first_line, step.action)
+        return -1 if _bump(self._pair_counts, key, self.capacity) > 1 else 0
+
+    def fork(self) -> "LoopPenaltyEvaluator":
+        child = copy.copy(self)
+        child._pair_counts = _fork_counts(self._pair_counts)
+        return child
+
     def evaluate(self, transcript: List[str]) -> int:
         # build list of (obs, action) pairs
         pairs = []
@@ -79,7 +161,21 @@ class NoveltyEvaluator:
     """
     Rewards new observations.
     Returns 1 if the last observation is unique in the transcript; otherwise 0.
+    update() remembers digests of the `capacity` most recently seen observations.
     """
+    def __init__(self, capacity: int = 100_000):
+        self.capacity = capacity
+        self._obs_counts: OrderedDict = OrderedDict()
+
+    def update(self, step: Step) -> int:
+        key = hashlib.blake2b(step.obs.encode("utf-8"), digest_size=8).digest()
+        return 1 if _bump(self._obs_counts, key, self.capacity) == 1 else 0
+
+    def fork(self) -> "NoveltyEvaluator":
+        child = copy.copy(self)
+        child._obs_counts = _fork_counts(self._obs_counts)
+        return child
+
     def evaluate(self, transcript: List[str]) -> int:
         if not transcript:
             return 0
@@ -103,37 +199,90 @@ class KeywordEvaluator:
         last_obs = transcript[-1].lower()
         return self.reward if any(k in last_obs for k in self.keywords) else 0
 
+    def update(self, step: Step) -> int:
+        obs = step.obs.lower()
+        return self.reward if any(k in obs for k in self.keywords) else 0
+
+    def fork(self) -> "KeywordEvaluator":
+        return self
+
 # ──────────────────────────────────────────────────────────────────────
-# 6. LLMEvaluator (self-evaluation via LLM)
+# 6. CyclePenaltyEvaluator
+# ──────────────────────────────────────────────────────────────────────
+class CyclePenaltyEvaluator:
+    """
+    Penalizes trajectories that have fallen into a cycle of any period.
+    Returns -1 while the latest steps repeat an earlier stretch of
+    (observation, action) pairs; otherwise 0. Memory is bounded by `window`.
+    """
+    def __init__(self, window: int = 512, min_repeats: int = 2):
+        self.detector = CycleDetector(window=window, min_repeats=min_repeats)
+
+    def update(self, step: Step) -> int:
+        return -1 if self.detector.push(step.obs, step.action) else 0
+
+    def fork(self) -> "CyclePenaltyEvaluator":
+        child = copy.copy(self)
+        child.detector = self.detector.fork()
+        return child
+
+    def evaluate(self, transcript: List[str]) -> int:
+        # locate the last "> action" line; its observation follows it
+        for i in range(len(transcript) - 1, -1, -1):
+            if transcript[i].startswith('> '):
+                obs = transcript[i+1] if i + 1 < len(transcript) else ''
+                return -1 if self.detector.push(obs, transcript[i][2:]) else 0
+        return 0
+
+# ──────────────────────────────────────────────────────────────────────
+# 7. LLMEvaluator (self-evaluation via LLM)
 # ──────────────────────────────────────────────────────────────────────
 class LLMEvaluator:
     """
     Uses an LLM to self-evaluate the trajectory. Returns an integer reward.
     Prompts: System instruction + transcript snippet + 'Reward:'.
     """
-    def __init__(self, client: OllamaClient, system_prompt: str = None):
+    def __init__(self, client: OllamaClient, system_prompt: str = None,
+                 max_prompt_tokens: int = DEFAULT_BUDGETS["evaluator"], history_size: int = 64):
         self.client = client
         self.system_prompt = (
             system_prompt or
             'You are an assistant evaluating the success of an agent in a text adventure. '
             'Given the transcript of actions and observations, return a single integer reward between -1 and 1.'
         )
+        # history_size only bounds the window; the token budget decides what is sent
+        self.max_prompt_tokens = max_prompt_tokens
+        self.history_size = history_size
+        self._window: deque = deque(maxlen=self.history_size)
+        self.prompt = compile_template(
+            self.system_prompt, "Transcript:\n{transcript}\n\nReward:", (("transcript", TAIL),)
+        )
+
+    def update(self, step: Step) -> int:
+        self._window.append(f"> {step.action}")
+        self._window.extend(step.obs.splitlines())
+        return self._score(self._window)
 
     def evaluate(self, transcript: List[str]) -> int:
-        # take last 10 lines for context
-        snippet = '\n'.join(transcript[-10:])
-        prompt = (
-            f"{self.system_prompt}\n\n"
-            f"Transcript:\n{snippet}\n\n"
-            "Reward:"
-        )
-        response = self.client.complete(prompt)
-        # parse first integer in response
+        return self._score(transcript[-self.history_size:])
+
+    def _score(self, lines) -> int:
+        prompt = self.prompt.render(self.max_prompt_tokens, transcript=list(lines))
+        reward = self._parse(self.client.complete(prompt))
+        return 0 if reward is None else max(min(reward, 1), -1)
+
+    @staticmethod
+    def _parse(response: str) -> int | None:
+        # first integer in the response
         for line in response.splitlines():
             for token in line.split():
                 try:
-                    val = int(token)
-                    return max(min(val, 1), -1)
+                    return int(token)
                 except ValueError:
                     continue
-        return 0
\ No newline at end of file
+        return None
+
+    def accept_response(self, text: str) -> bool:
+        """Cascade check: the reply holds an integer reward in [-1, 1]."""
+        reward = self._parse(text)
+        return reward is not None and -1 <= reward <= 1
\ No newline at end of file
@@ -1,8 +1,22 @@
-from typing import Protocol
-from jericho import FrotzEnv
+from __future__ import annotations
+
+import re
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, List, Protocol, Tuple
+from engine.action_parser import ActionParser
 from engine.core import AgentState
+from engine.episodic import EpisodicMemory
+from engine.explore import ExplorationArchive
+from engine.prompts import DEFAULT_BUDGETS, HEAD, LIST, compile_template
+from engine.transcript import Step
+from engine.valid_actions import ValidActionCache
+from engine.world_map import WorldMap
 import random
-from utils.ollama import OllamaClient
+import numpy as np
+
+if TYPE_CHECKING:
+    from jericho import FrotzEnv
+    from utils.ollama import OllamaClient
 
 # ──────────────────────────────────────────────────────────────────────
 # 1. Reasoner interface
@@ -24,6 +38,24 @@ class RandomReasoner:
     def choose_action(self, state: AgentState, env: FrotzEnv) -> str:
         return random.choice(["look", "north", "south", "east", "west"])
 
+def _reprompter(reasoner, obs: str, valid_actions: List[str]):
+    """
+    Callable for ActionParser.snap: one short follow-up call naming the
+    rejected reply. It shares the reasoner's system prefix, so the server's
+    prompt cache still applies.
+    """
+    body = "Observation:\n{obs}\n'{bad}' is not a command the game understands.\n"
+    trim = [("obs", HEAD)]
+    fields = {"obs": obs}
+    if valid_actions:
+        body += "Valid actions: {valid}\n"
+        trim.append(("valid", LIST))
+        fields["valid"] = valid_actions
+    template = compile_template(reasoner.system_prompt, body + "\nNext command:", tuple(trim))
+    return lambda bad: reasoner.client.complete(
+        template.render(reasoner.max_prompt_tokens, bad=bad, **fields), first_line=True
+    )
+
 # ──────────────────────────────────────────────────────────────────────
 # 3. LLMReasoner with valid actions context
 # ──────────────────────────────────────────────────────────────────────
@@ -31,31 +63,71 @@ class LLMReasoner(Reasoner):
     """
     Uses an LLM to pick the next command based on the latest observation,
     and includes valid actions in the prompt.
+
+    With `episodic_k` > 0 every finished turn is stored in an EpisodicMemory
+    (persisted at `episodic_path`, if set, and reused by later episodes) and
+    the `episodic_k` past experiences most similar to the current
+    observation are added to the prompt. Turns arrive through
+    record_transition(), which the engine calls for every turn, including
+    ones this reasoner did not choose (autopilot moves, Go-Explore restores).
     """
-    def __init__(self, client: OllamaClient, system_prompt: str = None):
+    def __init__(self, client: OllamaClient, system_prompt: str = None,
+                 max_prompt_tokens: int = DEFAULT_BUDGETS["reasoner"],
+                 episodic_k: int = 0, episodic_path: str = None, episodic_capacity: int = 4096):
         self.client = client
         self.system_prompt = (
             system_prompt
             or "You are an AI agent playing a text-based adventure. Respond with exactly one valid command."
         )
+        self.max_prompt_tokens = max_prompt_tokens
+        self.valid_actions = ValidActionCache()
+        self.parser = ActionParser()
+        self.episodic_k = episodic_k
+        self.episodic = (
+            EpisodicMemory(capacity=episodic_capacity, path=episodic_path) if episodic_k > 0 else None
+        )
+        # (env, valid actions) of the pending call, for accept_response
+        self._context: tuple = (None, None)
+
+    def _template(self, valid: bool, experience: bool):
+        # budget priority: observation, then experiences, then valid actions
+        body = "Observation:\n{obs}\n"
+        trim = [("obs", HEAD)]
+        if experience:
+            body += "Relevant past experience:\n{experience}\n"
+            trim.append(("experience", HEAD))
+        if valid:
+            body += "Valid actions: {valid}\n"
+            trim.append(("valid", LIST))
+        body += "\nNext command:" if valid or experience else "\n\nNext command:"
+        return compile_template(self.system_prompt, body, tuple(trim))
 
     def choose_action(self, state: AgentState, env: FrotzEnv) -> str:
         obs = state["obs"]
-        # Fetch valid actions for context
-        try:
-            valid_actions = env.get_valid_actions(use_ctypes=False)
-        except Exception:
-            valid_actions = []
-
-        valid_text = f"Valid actions: {', '.join(valid_actions)}" if valid_actions else ""
-        prompt = (
-            f"{self.system_prompt}\n\n"
-            f"Observation:\n{obs}\n"
-            f"{valid_text}\n\n"
-            "Next command:"
+        # Fetch valid actions for context (cached per world state)
+        valid_actions = self.valid_actions.get(env)
+
+        fields = {"obs": obs}
+        if valid_actions:
+            fields["valid"] = valid_actions
+        if self.episodic is not None:
+            experience = [text for _, text in self.episodic.search(obs, self.episodic_k)]
+            if experience:
+                fields["experience"] = experience
+        prompt = self._template("valid" in fields, "experience" in fields).render(
+            self.max_prompt_tokens, **fields
         )
-        response = self.client.complete(prompt)
-        return response.splitlines()[0].strip()
+        self._context = (env, valid_actions)
+        response = self.client.complete(prompt, first_line=True)
+        return self.parser.snap(response, env, valid_actions, _reprompter(self, obs, valid_actions))
+
+    def accept_response(self, text: str) -> bool:
+        """Cascade check: the reply names a command without fuzzy guessing."""
+        return self.parser.confident(text, *self._context)
+
+    def record_transition(self, obs: str, action: str, outcome: str, reward: int, reflection: str) -> None:
+        if self.episodic is not None:
+            self.episodic.add(obs, action, outcome, reward, reflection)
 
 # ──────────────────────────────────────────────────────────────────────
 # 4. LLMReasonerNoValids: without valid actions context
@@ -65,19 +137,376 @@ class LLMReasonerNoValids(Reasoner):
     Uses an LLM to pick the next command based on the latest observation,
     without fetching valid actions for context.
     """
-    def __init__(self, client: OllamaClient, system_prompt: str = None):
+    def __init__(self, client: OllamaClient, system_prompt: str = None,
+                 max_prompt_tokens: int = DEFAULT_BUDGETS["reasoner"]):
         self.client = client
         self.system_prompt = (
             system_prompt
             or "You are an AI agent playing a text-based adventure. Respond with exactly one valid command."
         )
+        self.max_prompt_tokens = max_prompt_tokens
+        self.parser = ActionParser()
+        self.prompt = compile_template(
+            self.system_prompt, "Observation:\n{obs}\n\nNext command:", (("obs", HEAD),)
+        )
+        self._context: tuple = (None, None)
+
+    def choose_action(self, state: AgentState, env: FrotzEnv) -> str:
+        obs = state["obs"]
+        prompt = self.prompt.render(self.max_prompt_tokens, obs=obs)
+        self._context = (env, None)
+        response = self.client.complete(prompt, first_line=True)
+        return self.parser.snap(response, env, reprompt=_reprompter(self, obs, []))
+
+    def accept_response(self, text: str) -> bool:
+        """Cascade check: the reply names a command without fuzzy guessing."""
+        return self.parser.confident(text, *self._context)
+
+# ──────────────────────────────────────────────────────────────────────
+# 5. LookaheadReasoner: search over FrotzEnv snapshots
+# ──────────────────────────────────────────────────────────────────────
+class SnapshotPool:
+    """
+    Bounded LRU of env.get_state() snapshots keyed by world-state hash, so
+    revisiting a state during search (or across turns) reuses the captured
+    buffers instead of allocating new ones. The hash leaves out the move
+    counter, RNG and most globals, so a pooled snapshot only approximates
+    the state it was looked up for: fine for scoring search children, never
+    for putting the real game back.
+    """
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self._snapshots: OrderedDict = OrderedDict()
+
+    def capture(self, env: FrotzEnv) -> Tuple[str, tuple]:
+        key = env.get_world_state_hash()
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            snapshot = env.get_state()
+            self._snapshots[key] = snapshot
+            if len(self._snapshots) > self.capacity:
+                self._snapshots.popitem(last=False)
+        else:
+            self._snapshots.move_to_end(key)
+        return key, snapshot
+
+
+class LookaheadReasoner:
+    """
+    Simulates candidate actions from env.get_valid_actions() on restored
+    snapshots and picks the first action of the best line of play.
+
+    Beam search to `depth` plies keeping `beam_width` nodes per ply. A
+    simulated step is valued by a fork of the engine's Evaluator (bound via
+    bind_evaluator), or by the game-score delta when none is bound, it has
+    no fork(), or it calls an LLM. Forks read the evaluator's history
+    through a copy-on-write layer and record only the simulated steps, so
+    their cost does not grow with episode length (CyclePenaltyEvaluator
+    copies its fixed-size window). Unvisited world states earn
+    `novelty_bonus`; terminal states cost 1. No model calls are made.
+    """
+    def __init__(
+        self,
+        client: OllamaClient = None,
+        depth: int = 2,
+        beam_width: int = 4,
+        discount: float = 0.9,
+        novelty_bonus: float = 0.1,
+        snapshot_capacity: int = 256,
+        visit_capacity: int = 10_000
+    ):
+        self.depth = depth
+        self.beam_width = beam_width
+        self.discount = discount
+        self.novelty_bonus = novelty_bonus
+        self.evaluator = None
+        self.snapshots = SnapshotPool(snapshot_capacity)
+        self.valid_actions = ValidActionCache()
+        self.visit_capacity = visit_capacity
+        self._visits: OrderedDict = OrderedDict()
+
+    def bind_evaluator(self, evaluator) -> None:
+        # LLM-backed evaluators would defeat the point of simulating
+        if hasattr(evaluator, "fork") and not hasattr(evaluator, "client"):
+            self.evaluator = evaluator
+
+    def choose_action(self, state: AgentState, env: FrotzEnv) -> str:
+        # a fresh snapshot: the real game must come back exactly as it was
+        root = env.get_state()
+        self._mark_visited(env.get_world_state_hash())
+        try:
+            best = self._search(env, root)
+        finally:
+            env.set_state(root)
+        return best or random.choice(["look", "north", "south", "east", "west"])
+
+    def _search(self, env: FrotzEnv, root: tuple) -> str | None:
+        # beam entries: (value, first_action, snapshot, probe evaluator)
+        beam = [(0.0, None, root, self.evaluator)]
+        weight = 1.0
+        for _ in range(self.depth):
+            children = []
+            for value, first, snapshot, probe in beam:
+                env.set_state(snapshot)
+                actions = self.valid_actions.get(env)
+                for action in actions:
+                    env.set_state(snapshot)
+                    score_before = env.get_score()
+                    obs, _, done, info = env.step(action)
+                    child_probe = probe.fork() if probe is not None else None
+                    step = Step(0, action, obs.strip(), info.get("score", 0), done)
+                    reward = (
+                        child_probe.update(step) if child_probe is not None
+                        else info.get("score", 0) - score_before
+                    )
+                    key, child = self.snapshots.capture(env)
+                    if key not in self._visits:
+                        reward += self.novelty_bonus
+                    if done:
+                        reward -= 1
+                    children.append((value + weight * reward, first or action, child, child_probe))
+            if not children:
+                break
+            children.sort(key=lambda c: c[0], reverse=True)
+            beam = children[:self.beam_width]
+            weight *= self.discount
+        return beam[0][1]
+
+    def _mark_visited(self, key: str) -> None:
+        self._visits[key] = self._visits.get(key, 0) + 1
+        self._visits.move_to_end(key)
+        if len(self._visits) > self.visit_capacity:
+            self._visits.popitem(last=False)
+
+# ──────────────────────────────────────────────────────────────────────
+# 6. NavigatingLLMReasoner: LLMReasoner + world map autopilot
+# ──────────────────────────────────────────────────────────────────────
+class NavigatingLLMReasoner(LLMReasoner):
+    """
+    LLMReasoner that maintains a WorldMap of visited rooms. After `patience`
+    consecutive LLM turns in a room with no untried exits, it walks the
+    shortest known route to the nearest room that still has some, issuing
+    those moves directly without calling the model.
+    """
+    def __init__(self, client: OllamaClient, system_prompt: str = None, patience: int = 3,
+                 max_prompt_tokens: int = DEFAULT_BUDGETS["reasoner"],
+                 episodic_k: int = 0, episodic_path: str = None, episodic_capacity: int = 4096):
+        super().__init__(client, system_prompt, max_prompt_tokens,
+                         episodic_k, episodic_path, episodic_capacity)
+        self.world = WorldMap()
+        self.patience = patience
+        self.autopilot_moves = 0
+        self._route: List[Tuple[str, int]] = []
+        self._prev_room: int | None = None
+        self._stale_turns = 0
+
+    def choose_action(self, state: AgentState, env: FrotzEnv) -> str:
+        room = self.world.room_id(env, state["obs"])
+        if self._prev_room is not None and state["last_action"]:
+            self.world.record(self._prev_room, state["last_action"], room)
+        self._prev_room = room
+        self.world.add_exits(room, self.valid_actions.get(env))
+
+        # continue an active route while the world behaves as expected
+        if self._route and self._route[0][1] == room:
+            self._route.pop(0)
+        elif self._route:
+            self._route = []
+        if self._route:
+            self.autopilot_moves += 1
+            return self._route[0][0]
+
+        if self.world.has_frontier(room):
+            self._stale_turns = 0
+        else:
+            self._stale_turns += 1
+            if self._stale_turns > self.patience:
+                route = self.world.path_to_frontier(room)
+                if route:
+                    self._route = route
+                    self._stale_turns = 0
+                    self.autopilot_moves += 1
+                    return route[0][0]
+        return super().choose_action(state, env)
+
+# ──────────────────────────────────────────────────────────────────────
+# 7. PlanningReasoner: one LLM call per multi-command plan
+# ──────────────────────────────────────────────────────────────────────
+_FAILURE = re.compile(
+    r"^(?:you can't|you cannot|i don't (?:know|understand)|there is no|there's no|you don't (?:see|have)"
+    r"|that's not|i beg your pardon|what do you want to|it is already|you're not|nothing happens)",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+class PlanningReasoner:
+    """
+    Asks the model for a plan of up to `plan_length` commands and executes it
+    without further calls. The plan is dropped and the model asked again
+    when the game diverges from it: a failure message, a score change, or
+    arrival in a room not seen before.
+
+    plan_boundary(state, env) reports whether the next turn re-plans; with
+    `plan_boundary_only` the engine runs the evaluator and reflector only
+    at those turns.
+    """
+    def __init__(self, client: OllamaClient, system_prompt: str = None, plan_length: int = 5,
+                 max_prompt_tokens: int = DEFAULT_BUDGETS["reasoner"]):
+        self.client = client
+        self.system_prompt = (
+            system_prompt
+            or "You are an AI agent playing a text-based adventure. "
+               "Respond with a short plan: one valid command per line, nothing else."
+        )
+        self.plan_length = plan_length
+        self.max_prompt_tokens = max_prompt_tokens
+        self.valid_actions = ValidActionCache()
+        self.parser = ActionParser()
+        self.prompt = compile_template(
+            self.system_prompt,
+            "Observation:\n{obs}\nValid actions: {valid}\n\n"
+            f"Next commands (at most {plan_length}):",
+            (("obs", HEAD), ("valid", LIST)),
+        )
+        self.plans = 0
+        self.replans = 0
+        self.planned_moves = 0
+        self._plan: deque = deque()
+        self._rooms: set = set()
+        self._score = 0
+        self._context: tuple = (None, None)
+
+    def plan_boundary(self, state: AgentState, env: FrotzEnv) -> bool:
+        return not self._plan or self._diverged(state, env)
 
     def choose_action(self, state: AgentState, env: FrotzEnv) -> str:
+        if self._plan:
+            if not self._diverged(state, env):
+                self._note(state, env)
+                self.planned_moves += 1
+                return self._plan.popleft()
+            self.replans += 1
+        self._note(state, env)
+        self._plan = deque(self._make_plan(state, env))
+        return self._plan.popleft() if self._plan else "look"
+
+    def stats(self) -> dict:
+        return {"plans": self.plans, "replans": self.replans, "planned_moves": self.planned_moves}
+
+    def accept_response(self, text: str) -> bool:
+        """Cascade check: the plan's first command resolves without fuzzy guessing."""
+        return self.parser.confident(text, *self._context)
+
+    def _room(self, env: FrotzEnv, obs: str):
+        try:
+            location = env.get_player_location()
+            if location is not None:
+                return location.num
+        except Exception:
+            pass
+        return obs.split("\n", 1)[0].strip()
+
+    def _diverged(self, state: AgentState, env: FrotzEnv) -> bool:
+        # side-effect free: the engine may ask before choose_action does
+        return (
+            bool(_FAILURE.search(state["obs"]))
+            or env.get_score() != self._score
+            or self._room(env, state["obs"]) not in self._rooms
+        )
+
+    def _note(self, state: AgentState, env: FrotzEnv) -> None:
+        self._rooms.add(self._room(env, state["obs"]))
+        self._score = env.get_score()
+
+    def _make_plan(self, state: AgentState, env: FrotzEnv) -> List[str]:
+        self.plans += 1
         obs = state["obs"]
-        prompt = (
-            f"{self.system_prompt}\n\n"
-            f"Observation:\n{obs}\n\n"
-            "Next command:"
+        valid_actions = self.valid_actions.get(env)
+        self._context = (env, valid_actions)
+        response = self.client.complete(
+            self.prompt.render(self.max_prompt_tokens, obs=obs, valid=valid_actions)
         )
-        response = self.client.complete(prompt)
-        return response.splitlines()[0].strip()
\ No newline at end of file
+        lines = [line for line in response.splitlines() if line.strip()]
+        # the first command is checked against the valid actions of this state;
+        # later ones only against the game's vocabulary
+        first = self.parser.snap(lines[0] if lines else "", env, valid_actions,
+                                 _reprompter(self, obs, valid_actions))
+        plan = [first]
+        for line in lines[1:self.plan_length]:
+            command = self.parser.parse(line, env)
+            if command is None:
+                break
+            plan.append(command)
+        return plan
+
+# ──────────────────────────────────────────────────────────────────────
+# 8. GoExploreReasoner: restore into promising archived states
+# ──────────────────────────────────────────────────────────────────────
+class GoExploreReasoner:
+    """
+    Go-Explore style exploration. Every reached state is added to an
+    ExplorationArchive; after `explore_steps` turns from one starting cell
+    the reasoner picks an archived cell (rarely chosen, rarely visited or
+    high-scoring), restores the env straight into it and sets state["obs"]
+    to that cell's observation, instead of walking back.
+
+    Actions from a cell come from `explorer`: "random" (a random valid
+    action, no model calls) or the name of another reasoner, e.g.
+    LLMReasoner, built with the same client.
+    """
+    def __init__(
+        self,
+        client: OllamaClient = None,
+        explore_steps: int = 20,
+        capacity: int = 2048,
+        cell_key: str = "hash",
+        score_weight: float = 1.0,
+        explorer: str = "random",
+        seed: int = None
+    ):
+        self.archive = ExplorationArchive(capacity, cell_key, score_weight)
+        self.explore_steps = explore_steps
+        self.valid_actions = ValidActionCache()
+        self.explorer = None
+        if explorer != "random":
+            from engine import registry
+            self.explorer = registry.create("reasoner", explorer, client)
+        self.restores = 0
+        self.trajectory = None
+        # derived from `random` by default so batch-mode seeding applies
+        self._rng = np.random.default_rng(random.getrandbits(64) if seed is None else seed)
+        self._steps_from_cell = 0
+
+    def choose_action(self, state: AgentState, env: FrotzEnv) -> str:
+        self.archive.add(env, state["obs"], env.get_score())
+        self._steps_from_cell += 1
+        if self._steps_from_cell > self.explore_steps and len(self.archive) > 1:
+            cell = self.archive.select(self._rng)
+            self.archive.restore(env, cell)
+            state["obs"] = cell.obs
+            self.restores += 1
+            if self.trajectory is not None:
+                self.trajectory.log_restore(env.get_state(), cell.obs)
+            self._steps_from_cell = 0
+
+        if self.explorer is not None:
+            return self.explorer.choose_action(state, env)
+        actions = self.valid_actions.get(env)
+        return random.choice(actions) if actions else random.choice(["look", "north", "south", "east", "west"])
+
+    def stats(self) -> dict:
+        return {**self.archive.stats(), "restores": self.restores}
+
+    def bind_trajectory(self, trajectory) -> None:
+        # restores are env jumps, not steps; the log needs them for replay
+        self.trajectory = trajectory
+
+    def record_transition(self, *transition) -> None:
+        record = getattr(self.explorer, "record_transition", None)
+        if record is not None:
+            record(*transition)
+
+    def accept_response(self, text: str) -> bool:
+        # only an LLM explorer calls the client
+        accept = getattr(self.explorer, "accept_response", None)
+        return accept(text) if accept is not None else bool(text.strip())
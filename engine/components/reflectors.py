@@ -1,5 +1,10 @@
-from typing import Protocol, List
-from utils.ollama import OllamaClient
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Protocol, List
+from engine.prompts import DEFAULT_BUDGETS, TAIL, compile_template
+
+if TYPE_CHECKING:
+    from utils.ollama import OllamaClient
 
 # ──────────────────────────────────────────────────────────────────────
 # Reflector interface and implementations
@@ -22,22 +27,25 @@ class LLMReflector:
     """
     Uses an LLM to summarize recent events and the reward into a concise reflection.
     """
-    def __init__(self, client: OllamaClient, system_prompt: str = None, history_size: int = 10):
+    def __init__(self, client: OllamaClient, system_prompt: str = None, history_size: int = 64,
+                 max_prompt_tokens: int = DEFAULT_BUDGETS["reflector"]):
         self.client = client
         self.system_prompt = system_prompt or (
             "You are an assistant that reflects on an agent's gameplay. "
             "Given the recent transcript and the reward received, provide 1-2 insightful sentences."
         )
+        # history_size caps the lines considered; the token budget decides what is sent
         self.history_size = history_size
+        self.max_prompt_tokens = max_prompt_tokens
+        self.prompt = compile_template(
+            self.system_prompt,
+            "Recent transcript:\n{transcript}\nRecent reward: {reward}\n\nReflection:",
+            (("transcript", TAIL),),
+        )
 
     def reflect(self, transcript: List[str], reward: int) -> str:
-        # take last N lines for context
-        snippet = "\n".join(transcript[-self.history_size:])
-        prompt = (
-            f"{self.system_prompt}\n\n"
-            f"Recent transcript:\n{snippet}\n"  
-            f"Recent reward: {reward}\n\n"
-            "Reflection:"
+        prompt = self.prompt.render(
+            self.max_prompt_tokens, transcript=transcript[-self.history_size:], reward=reward
         )
         response = self.client.complete(prompt)
         # return first paragraph of response
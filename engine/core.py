@@ -1,19 +1,31 @@
+from __future__ import annotations
+
 import os
+import random
 import sys
 import threading
-from typing import Protocol, List
-from jericho import FrotzEnv
-from langgraph.graph import StateGraph
-from langchain_core.runnables import RunnableConfig
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Protocol, List
+from evaluator.post_run import RunMetrics
+from engine.checkpoint import Checkpointer, restore_component
+from engine.instrumentation import Instrumentation
+from engine.memory import MemoryStore
+from engine.trajlog import TrajectoryWriter, config_hash
+from engine.transcript import Transcript
+
+if TYPE_CHECKING:
+    from jericho import FrotzEnv
 
 # ──────────────────────────────────────────────────────────────────────
 # 1. AgentState definition (used in LangGraph)
 # ──────────────────────────────────────────────────────────────────────
 class AgentState(dict):
     obs: str
-    memory: str
+    memory: str           # rendered view of the bounded MemoryStore
     last_action: str
-    seen: List[str]
+    seen: deque           # most recent "obs::action" keys, bounded
     reward: int
     reflection: str
     done: bool
@@ -30,6 +42,10 @@ class Reasoner(Protocol):
 class Evaluator(Protocol):
     """
     Computes a scalar reward from the transcript of past turns.
+
+    Evaluators may also implement `update(step) -> int`, which is fed one
+    Step per turn and should cost O(1); the engine prefers it when present
+    and falls back to `evaluate(transcript)` otherwise.
     """
     def evaluate(self, transcript: List[str]) -> int: ...
 
@@ -43,51 +59,76 @@ class Reflector(Protocol):
 # 3. Node implementations (Reason, Act, Observe, Reflect)
 # ──────────────────────────────────────────────────────────────────────
 
-def reason(state: AgentState, env: FrotzEnv, reasoner: Reasoner) -> AgentState:
+def reason(state: AgentState, env: FrotzEnv, reasoner: Reasoner, loop_breaker=None) -> AgentState:
     """
-    Reason node: choose the next action via the Reasoner.
+    Reason node: choose the next action via the Reasoner, letting the
+    optional loop breaker override it when it would close a cycle.
     """
-    state["last_action"] = reasoner.choose_action(state, env)
+    action = reasoner.choose_action(state, env)
+    if loop_breaker is not None:
+        action = loop_breaker.avoid_loop(state, action)
+    state["last_action"] = action
     return state
 
 
-def act(state: AgentState, env: FrotzEnv) -> AgentState:
+def act(state: AgentState, env: FrotzEnv, transcript: Transcript) -> AgentState:
     """
     Act node: execute the last action in the env, update obs/memory/seen,
-    and set the done flag.
+    append the turn to the transcript, and set the done flag.
     """
     action = state["last_action"]
-    obs, _, done, _ = env.step(action)
+    obs, _, done, info = env.step(action)
     obs = obs.strip()
     print(f"> {action}\n{obs}\n")
+    transcript.append_step(action, obs, score=info.get("score", 0), done=done)
     state["obs"] = obs
-    state["memory"] += f"\n> {action}\n{obs}"
+    state["memory"] = transcript.memory.render()
     state["seen"].append(f"{obs}::{action}")
     state["done"] = done
     return state
 
 
-def observe(state: AgentState, evaluator: Evaluator) -> AgentState:
+def observe(state: AgentState, evaluator: Evaluator, transcript: Transcript) -> AgentState:
     """
-    Observe node: compute reward based on memory transcript.
+    Observe node: compute reward for the latest step, incrementally when the
+    evaluator supports it.
     """
-    transcript = state["memory"].splitlines()
-    state["reward"] = evaluator.evaluate(transcript)
+    if hasattr(evaluator, "update") and transcript.steps:
+        state["reward"] = evaluator.update(transcript.steps[-1])
+    else:
+        window = getattr(evaluator, "history_size", transcript.memory.window)
+        state["reward"] = evaluator.evaluate(transcript.tail(window))
     return state
 
 
-def reflect_node(state: AgentState, reflector: Reflector) -> AgentState:
+def reflect_node(state: AgentState, reflector: Reflector, transcript: Transcript) -> AgentState:
     """
     Reflect node: generate and append a reflection based on transcript and reward.
     """
-    transcript = state["memory"].splitlines()
-    reflection = reflector.reflect(transcript, state["reward"])
+    window = getattr(reflector, "history_size", transcript.memory.window)
+    reflection = reflector.reflect(transcript.tail(window), state["reward"])
     state["reflection"] = reflection
-    state["memory"] += f"\n[Reflection]\n{reflection}"
+    transcript.append_reflection(reflection)
+    state["memory"] = transcript.memory.render()
     return state
 
 # ──────────────────────────────────────────────────────────────────────
 # 4. Engine orchestration with LangGraph
+#
+# Topologies:
+#   serial        reason → act → observe → reflect → reason
+#   parallel      reason → act → {observe ∥ reflect} → reason
+#                 (the reflector sees the reward of the previous turn)
+#   async_reflect serial, but the reflector runs in the background and its
+#                 result is folded into the state on a later turn
+#
+# Engine modes:
+#   graph         compiled LangGraph StateGraph
+#   native        the same nodes driven by NativeGraph (section 5)
+# ──────────────────────────────────────────────────────────────────────
+TOPOLOGIES = ("serial", "parallel", "async_reflect")
+ENGINE_MODES = ("graph", "native")
+
 # ──────────────────────────────────────────────────────────────────────
 class ZorkinatorEngine:
     def __init__(
@@ -95,47 +136,290 @@ class ZorkinatorEngine:
         game_path: str,
         reasoner: Reasoner,
         evaluator: Evaluator,
-        reflector: Reflector
+        reflector: Reflector,
+        seed: int | None = None,
+        watch_stdin: bool = True,
+        memory_window: int = 200,
+        memory_spill_path: str | None = None,
+        seen_window: int = 1000,
+        topology: str = "serial",
+        engine_mode: str = "graph",
+        plan_boundary_only: bool = False,
+        loop_breaker=None,
+        metrics: Instrumentation | None = None,
+        checkpointer: Checkpointer | None = None,
+        trajectory_dir: str | None = None,
+        run_config: dict | None = None,
+        resume: bool = False
     ):
-        self.env = FrotzEnv(game_path)
+        from jericho import FrotzEnv
+
+        # no seed: the game's own (walkthrough) seed, as Jericho defaults to
+        self.env = FrotzEnv(game_path) if seed is None else FrotzEnv(game_path, seed=seed)
         obs0, _ = self.env.reset()
         self.reasoner = reasoner
         self.evaluator = evaluator
         self.reflector = reflector
+        self.loop_breaker = loop_breaker
+        self.metrics = metrics if metrics is not None else Instrumentation()
+        self.checkpointer = checkpointer
+        self._stop_requested = False
+        self.run_metrics = RunMetrics(
+            obs0.strip(), llm_seconds=lambda: self.metrics.timers["llm.call"].total
+        )
+        self.metrics.add_provider("run", self.run_metrics.snapshot)
+        log_config = {
+            "reasoner": type(reasoner).__name__,
+            "evaluator": type(evaluator).__name__,
+            "reflector": type(reflector).__name__,
+            "topology": topology,
+        }
+        if run_config is not None:
+            # runs that differ only in options still aggregate separately
+            log_config.update(run=run_config, hash=config_hash(run_config))
+        self.trajectory = (
+            TrajectoryWriter(trajectory_dir, game_path, obs0, seed=seed, config=log_config, resume=resume)
+            if trajectory_dir else None
+        )
+        self._bind_reasoner()
+        self._record_transition = getattr(reasoner, "record_transition", None)
+        self._turn_obs: str | None = None
+        self.transcript = Transcript(
+            memory=MemoryStore(window=memory_window, spill_path=memory_spill_path),
+            step_window=seen_window
+        )
 
-        builder = StateGraph(AgentState)
-        builder.add_node("reason",  lambda s: reason(s, self.env, self.reasoner))
-        builder.add_node("act",     lambda s: act(s, self.env))
-        builder.add_node("observe", lambda s: observe(s, self.evaluator))
-        builder.add_node("reflect", lambda s: reflect_node(s, self.reflector))
-
-        builder.set_entry_point("reason")
-        builder.add_edge("reason",  "act")
-        builder.add_edge("act",     "observe")
-        builder.add_edge("observe", "reflect")
-        builder.add_edge("reflect", "reason")
-        self.graph = builder.compile()
+        if topology not in TOPOLOGIES:
+            raise ValueError(f"Unknown topology '{topology}'; expected one of {TOPOLOGIES}")
+        if plan_boundary_only and not hasattr(reasoner, "plan_boundary"):
+            raise ValueError(f"plan_boundary_only needs a planning reasoner, not {type(reasoner).__name__}")
+        self.plan_boundary_only = plan_boundary_only
+        self._segment_start = 0
+        self.graph_steps = 0  # states streamed by run_episode, across resumes
+        if engine_mode not in ENGINE_MODES:
+            raise ValueError(f"Unknown engine mode '{engine_mode}'; expected one of {ENGINE_MODES}")
+        self.topology = topology
+        self.engine_mode = engine_mode
+        self._reflect_pool: ThreadPoolExecutor | None = None
+        self._pending_reflection: Future | None = None
+        self.graph = (
+            self._build_native(topology) if engine_mode == "native"
+            else self._build_graph(topology)
+        )
 
         self.initial_state = AgentState(
             obs=obs0,
             memory="",
             last_action="",
-            seen=[],
+            seen=deque(maxlen=seen_window),
             reward=0,
             reflection="",
             done=False
         )
 
-        threading.Thread(target=self._watch_eof, daemon=True).start()
+        # Batch workers have no terminal attached; their stdin is /dev/null
+        # and would trip the EOF watcher immediately.
+        if watch_stdin:
+            threading.Thread(target=self._watch_eof, daemon=True).start()
+
+    def _timed(self, name: str, fn):
+        timer = self.metrics.timers[f"node.{name}"]
+        def node(state):
+            start = time.perf_counter()
+            try:
+                return fn(state)
+            finally:
+                timer.add(time.perf_counter() - start)
+        return node
+
+    def _reason(self, state: AgentState) -> AgentState:
+        # turn boundary: the previous turn is fully applied to every component
+        if self.checkpointer is not None:
+            if self._stop_requested:
+                path = self.checkpointer.save(self, state)
+                print(f"\n[Engine] Checkpoint written to {path} — exiting.")
+                os._exit(0)
+            if self.checkpointer.due(int(self.metrics.counters["env_steps"])):
+                self.checkpointer.save(self, state)
+        if self._record_transition is not None and self._turn_obs is not None and state["last_action"]:
+            # the finished turn: where it started, what was done, what came of it
+            self._record_transition(self._turn_obs, state["last_action"], state["obs"],
+                                    state["reward"], state["reflection"])
+        state = reason(state, self.env, self.reasoner, self.loop_breaker)
+        # after reason, so a reasoner that restores the env is accounted for
+        self._turn_obs = state["obs"]
+        return state
+
+    def _act(self, state: AgentState) -> AgentState:
+        state = act(state, self.env, self.transcript)
+        self.metrics.step()
+        return state
+
+    def _at_boundary(self, state: AgentState) -> bool:
+        return not self.plan_boundary_only or self.reasoner.plan_boundary(state, self.env)
+
+    def _observe(self, state: AgentState) -> AgentState:
+        if not self.plan_boundary_only:
+            state = observe(state, self.evaluator, self.transcript)
+        elif self._at_boundary(state):
+            state["reward"] = self._evaluate_segment()
+        else:
+            state["reward"] = 0
+        if self.transcript.steps:
+            step, moves = self.transcript.steps[-1], self.env.get_moves()
+            self.run_metrics.update(step, state["reward"], moves)
+            if self.trajectory is not None:
+                self.trajectory.log(step, state["reward"], moves)
+        return state
+
+    def _evaluate_segment(self) -> int:
+        """
+        Reward for the steps since the previous plan boundary. Every Step
+        goes through update(), so stateful evaluators see the whole
+        trajectory; an LLM evaluator (or one without update()) gets one
+        evaluate() call over exactly the segment's lines.
+        """
+        segment = [step for step in self.transcript.steps if step.index >= self._segment_start]
+        self._segment_start = len(self.transcript)
+        if hasattr(self.evaluator, "update") and not hasattr(self.evaluator, "client"):
+            return sum(self.evaluator.update(step) for step in segment)
+        lines = []
+        for step in segment:
+            lines.append(f"> {step.action}")
+            lines.extend(step.obs.splitlines())
+        return self.evaluator.evaluate(lines) if lines else 0
+
+    def _build_graph(self, topology: str):
+        # imported here: components import this module for AgentState and
+        # should not pay for LangGraph unless an engine is actually built
+        from langgraph.graph import StateGraph
+
+        builder = StateGraph(AgentState)
+        add_node = lambda name, fn: builder.add_node(name, self._timed(name, fn))
+        add_node("reason",  self._reason)
+        add_node("act",     self._act)
+        builder.set_entry_point("reason")
+        builder.add_edge("reason",  "act")
+
+        if topology == "parallel":
+            # Branches of one superstep must write disjoint keys.
+            add_node("observe", lambda s: {"reward": self._observe(s)["reward"]})
+            def reflect_branch(s):
+                s = self._reflect(s)
+                return {"reflection": s["reflection"], "memory": s["memory"]}
+            add_node("reflect", reflect_branch)
+            builder.add_edge("act", "observe")
+            builder.add_edge("act", "reflect")
+            builder.add_edge(["observe", "reflect"], "reason")
+            return builder.compile()
+
+        add_node("observe", self._observe)
+        if topology == "async_reflect":
+            self._reflect_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reflect")
+            add_node("reflect", self._reflect_async)
+        else:
+            add_node("reflect", self._reflect)
+        builder.add_edge("act",     "observe")
+        builder.add_edge("observe", "reflect")
+        builder.add_edge("reflect", "reason")
+        return builder.compile()
+
+    def _build_native(self, topology: str) -> "NativeGraph":
+        reason_ = self._timed("reason", self._reason)
+        act_ = self._timed("act", self._act)
+        observe_ = self._timed("observe", self._observe)
+        if topology == "parallel":
+            reflect_ = self._timed("reflect", self._reflect)
+
+            def observe_and_reflect(s):
+                # both branches see the post-act state, as in the graph's superstep
+                previous = s["reward"]
+                observe_(s)
+                reward, s["reward"] = s["reward"], previous
+                reflect_(s)
+                s["reward"] = reward
+                return s
+            return NativeGraph([("reason", reason_), ("act", act_),
+                                (("observe", "reflect"), observe_and_reflect)])
+
+        if topology == "async_reflect":
+            self._reflect_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reflect")
+            reflect_ = self._timed("reflect", self._reflect_async)
+        else:
+            reflect_ = self._timed("reflect", self._reflect)
+        return NativeGraph([("reason", reason_), ("act", act_),
+                            ("observe", observe_), ("reflect", reflect_)])
+
+    def _reflect(self, state: AgentState) -> AgentState:
+        if not self._at_boundary(state):
+            return state
+        return reflect_node(state, self.reflector, self.transcript)
+
+    def _reflect_async(self, state: AgentState) -> AgentState:
+        """
+        Non-blocking reflect node: publish the last finished reflection, and
+        start a new one unless the previous is still running.
+        """
+        pending = self._pending_reflection
+        if pending is not None and pending.done():
+            reflection = pending.result()
+            state["reflection"] = reflection
+            self.transcript.append_reflection(reflection)
+            state["memory"] = self.transcript.memory.render()
+            self._pending_reflection = pending = None
+        if pending is None and self._at_boundary(state):
+            window = getattr(self.reflector, "history_size", self.transcript.memory.window)
+            self._pending_reflection = self._reflect_pool.submit(
+                self.reflector.reflect, self.transcript.tail(window), state["reward"]
+            )
+        return state
+
+    def restore(self, payload: dict) -> None:
+        """
+        Continue from a checkpoint produced by Checkpointer.save(): the next
+        graph run starts from the restored env and state.
+        """
+        self.env.set_state(payload["env_state"])
+        self.transcript = payload["transcript"]
+        self._segment_start = len(self.transcript)
+        self.initial_state = AgentState(**payload["agent_state"])
+        restore_component(self.reasoner, payload["reasoner"])
+        restore_component(self.evaluator, payload["evaluator"])
+        restore_component(self.reflector, payload["reflector"])
+        if self.loop_breaker is not None:
+            restore_component(self.loop_breaker, payload["loop_breaker"])
+        restore_component(self.run_metrics, payload["run_metrics"])
+        self._bind_reasoner()  # older checkpoints carry stale copies of the bound parts
+        # the resumed stream yields the checkpointed state again; it was already counted
+        self.graph_steps = max(payload.get("graph_steps", 0) - 1, 0)
+        self.run_metrics.started = time.perf_counter()  # wall clock of this process
+        self.metrics.counters.update(payload["counters"])
+        random.setstate(payload["random"])
+        if self.trajectory is not None and payload.get("trajectory_steps") is not None:
+            self.trajectory.truncate(payload["trajectory_steps"])
+        if self.checkpointer is not None:
+            self.checkpointer.last_step = payload["env_steps"]
+
+    def _bind_reasoner(self) -> None:
+        """Hand the reasoner the engine's evaluator and trajectory log, if it takes them."""
+        if hasattr(self.reasoner, "bind_evaluator"):
+            self.reasoner.bind_evaluator(self.evaluator)
+        if self.trajectory is not None and hasattr(self.reasoner, "bind_trajectory"):
+            self.reasoner.bind_trajectory(self.trajectory)
 
     def _watch_eof(self):
         for _ in sys.stdin: pass
+        if self.checkpointer is not None:
+            # let the graph reach the next turn boundary and checkpoint there
+            print("\n[Engine] EOF detected — checkpointing before exit.")
+            self._stop_requested = True
+            return
         print("\n[Engine] EOF detected — exiting.")
         os._exit(0)
 
     def run(self):
         print("🚀 Zorkinator modular engine started")
-        cfg = RunnableConfig(recursion_limit=1_000_000)
+        cfg = {"recursion_limit": 1_000_000}
         for step, (phase, state) in enumerate(
             self.graph.stream(self.initial_state, cfg, stream_mode="updates"),
             start=1
@@ -143,4 +427,65 @@ class ZorkinatorEngine:
             print(f"[Step {step}] Phase={phase}, Action={state['last_action']}, Reward={state['reward']}")
             if state.get("done"):
                 print("[Engine] Terminal state reached. Exiting loop.")
-                break
\ No newline at end of file
+                break
+
+
+# ──────────────────────────────────────────────────────────────────────
+# 5. Native engine mode
+# ──────────────────────────────────────────────────────────────────────
+class NativeState:
+    """
+    Slotted, mutable AgentState for the native loop. Supports the mapping
+    operations the nodes, components and Checkpointer use (state[key],
+    state[key] = v, get, keys), so the same node functions run unchanged.
+    """
+    __slots__ = ("obs", "memory", "last_action", "seen", "reward", "reflection", "done")
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value) -> None:
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return self.__slots__
+
+
+class NativeGraph:
+    """
+    Runs a fixed cycle of supersteps in a plain loop over one NativeState,
+    with no per-transition state copies or channel bookkeeping. stream()
+    mirrors the compiled graph's: "values" yields the state (the input
+    first, then after every superstep), "updates" yields {node: state};
+    `recursion_limit` bounds the number of supersteps.
+    """
+    def __init__(self, supersteps: List[tuple]):
+        self.supersteps = supersteps
+
+    def stream(self, state, config: dict | None = None, stream_mode: str = "values"):
+        limit = (config or {}).get("recursion_limit", 25)
+        if not isinstance(state, NativeState):
+            state = NativeState(**state)
+        if stream_mode == "values":
+            yield state
+        cycle = len(self.supersteps)
+        for n in range(limit):
+            name, fn = self.supersteps[n % cycle]
+            fn(state)
+            if stream_mode == "values":
+                yield state
+            else:
+                yield {node: state for node in name} if isinstance(name, tuple) else {name: state}
@@ -0,0 +1,159 @@
+"""
+In-process episodic memory: a bounded vector index of past experiences.
+
+Each experience is an (observation, action, outcome, reward, reflection)
+tuple, stored as one line of text and keyed by a hashed bag-of-words
+embedding of the observation it was taken in. Lookup embeds the current
+observation and returns the top-k most similar experiences (cosine
+similarity, one matrix-vector product over the index).
+
+The index is a ring of `capacity` slots. With `path` set, vectors and texts
+live in np.memmap files (`<path>.vec`, `<path>.txt`) plus a small JSON
+header, so the memory survives the process and is shared by later episodes
+that point at the same path. Processes should not write to one path
+concurrently.
+"""
+
+import json
+import os
+import re
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """
+    Signed feature hashing of words and word bigrams into `dim` buckets,
+    L2-normalised. crc32 keeps bucket assignment stable across processes.
+    """
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def __call__(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vec = np.zeros(self.dim, dtype=np.float32)
+        if not features:
+            return vec
+        hashes = np.fromiter((zlib.crc32(f.encode()) for f in features), dtype=np.uint32, count=len(features))
+        signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+        vec += np.bincount(hashes % self.dim, weights=signs, minlength=self.dim).astype(np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+
+class EpisodicMemory:
+    """
+    Ring-buffer vector index with top-k cosine lookup.
+
+    add() costs one embedding and one row write; search() one embedding and
+    one (size x dim) matrix-vector product. Texts are stored as UTF-8 in
+    fixed `text_bytes` slots (longer ones are cut).
+    """
+    def __init__(
+        self,
+        capacity: int = 4096,
+        dim: int = 512,
+        path: Optional[str] = None,
+        text_bytes: int = 256,
+        flush_every: int = 64
+    ):
+        self.capacity = capacity
+        self.dim = dim
+        self.path = path
+        self.text_bytes = text_bytes
+        self.flush_every = flush_every
+        self.embed = HashingEmbedder(dim)
+        self.size = 0
+        self.head = 0
+        self._open()
+
+    def _open(self) -> None:
+        text_dtype = np.dtype(f"S{self.text_bytes}")
+        if not self.path:
+            self.vectors = np.zeros((self.capacity, self.dim), dtype=np.float32)
+            self.texts = np.zeros(self.capacity, dtype=text_dtype)
+            return
+        header = f"{self.path}.json"
+        exists = os.path.exists(header)
+        if exists:
+            with open(header) as f:
+                meta = json.load(f)
+            if (meta["capacity"], meta["dim"], meta["text_bytes"]) != (self.capacity, self.dim, self.text_bytes):
+                raise ValueError(
+                    f"Episodic memory at {self.path} was created with capacity={meta['capacity']}, "
+                    f"dim={meta['dim']}, text_bytes={meta['text_bytes']}"
+                )
+            self.size, self.head = meta["size"], meta["head"]
+        mode = "r+" if exists else "w+"
+        self.vectors = np.memmap(f"{self.path}.vec", dtype=np.float32, mode=mode,
+                                 shape=(self.capacity, self.dim))
+        self.texts = np.memmap(f"{self.path}.txt", dtype=text_dtype, mode=mode, shape=(self.capacity,))
+        if not exists:
+            self.flush()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, obs: str, action: str, outcome: str, reward: float = 0, reflection: str = "") -> None:
+        room = obs.split("\n", 1)[0]
+        result = outcome.split("\n", 1)[0]
+        text = f"At '{room}', '{action}' -> '{result}' (reward {reward})"
+        if reflection:
+            text += f" Note: {reflection}"
+        self.vectors[self.head] = self.embed(obs)
+        self.texts[self.head] = text.encode("utf-8")[:self.text_bytes]
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        if self.path and self.head % self.flush_every == 0:
+            self.flush()
+
+    def search(self, query: str, k: int = 3, min_score: float = 0.2) -> List[Tuple[float, str]]:
+        """The k most similar stored experiences (distinct texts), best first."""
+        if not self.size or k <= 0:
+            return []
+        scores = self.vectors[:self.size] @ self.embed(query)
+        # over-fetch so duplicates of one experience do not crowd out others
+        n = min(self.size, 4 * k)
+        top = np.argpartition(-scores, n - 1)[:n]
+        results, seen = [], set()
+        for i in top[np.argsort(-scores[top])]:
+            if scores[i] < min_score:
+                break
+            text = self.texts[i].decode("utf-8", "ignore")
+            if text not in seen:
+                seen.add(text)
+                results.append((float(scores[i]), text))
+                if len(results) == k:
+                    break
+        return results
+
+    def flush(self) -> None:
+        if not self.path:
+            return
+        self.vectors.flush()
+        self.texts.flush()
+        meta = {"capacity": self.capacity, "dim": self.dim, "text_bytes": self.text_bytes,
+                "size": self.size, "head": self.head}
+        with open(f"{self.path}.json.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(f"{self.path}.json.tmp", f"{self.path}.json")
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.path:
+            # on disk already; reopen the maps on unpickle
+            self.flush()
+            del state["vectors"], state["texts"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.path:
+            size, head = self.size, self.head
+            self._open()
+            self.size, self.head = size, head
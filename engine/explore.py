@@ -0,0 +1,122 @@
+"""
+Go-Explore style archive of distinct game states.
+
+Every state the agent reaches is reduced to a cell key: the world-state
+hash (`cell_key="hash"`), or the coarser (room, inventory, score) triple
+(`cell_key="room"`). The first time a cell is reached its FrotzEnv snapshot
+is stored, with the NumPy parts of get_state() zlib-compressed; later
+arrivals only bump its visit count.
+
+select() samples a cell to continue exploring from, favouring cells that
+have rarely been chosen or visited and cells with a higher score. The
+archive holds at most `capacity` cells; beyond that the lowest-value cell
+(most visited, lowest score) is evicted, never the best-scoring one.
+"""
+
+import zlib
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+def pack_state(state: tuple) -> tuple:
+    """Compress the ndarray parts of an env.get_state() tuple."""
+    return tuple(
+        ("nd", v.dtype.str, v.shape, zlib.compress(v.tobytes(), 1)) if isinstance(v, np.ndarray) else v
+        for v in state
+    )
+
+
+def unpack_state(packed: tuple) -> tuple:
+    return tuple(
+        np.frombuffer(zlib.decompress(v[3]), dtype=v[1]).reshape(v[2]).copy()
+        if isinstance(v, tuple) and len(v) == 4 and v[0] == "nd" else v
+        for v in packed
+    )
+
+
+class Cell:
+    __slots__ = ("key", "snapshot", "obs", "score", "visits", "chosen")
+
+    def __init__(self, key, snapshot: tuple, obs: str, score: int):
+        self.key = key
+        self.snapshot = snapshot
+        self.obs = obs
+        self.score = score
+        self.visits = 1
+        self.chosen = 0
+
+
+class ExplorationArchive:
+    """Bounded map from cell key to Cell; see the module docstring."""
+    def __init__(self, capacity: int = 2048, cell_key: str = "hash", score_weight: float = 1.0):
+        if cell_key not in ("hash", "room"):
+            raise ValueError(f"Unknown cell key '{cell_key}'; expected 'hash' or 'room'")
+        self.capacity = capacity
+        self.cell_key = cell_key
+        self.score_weight = score_weight
+        self.cells: Dict[Any, Cell] = {}
+        self.new_cells = 0
+        self.evictions = 0
+        self._best: Optional[Cell] = None
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def key(self, env, obs: str, score: int):
+        if self.cell_key == "hash":
+            return env.get_world_state_hash()
+        try:
+            location = env.get_player_location()
+            room = location.num if location is not None else obs.split("\n", 1)[0]
+            inventory = tuple(sorted(item.num for item in env.get_inventory()))
+        except Exception:
+            room, inventory = obs.split("\n", 1)[0], ()
+        return room, inventory, score
+
+    def add(self, env, obs: str, score: int) -> bool:
+        """Record the env's current state; returns True if it is a new cell."""
+        key = self.key(env, obs, score)
+        cell = self.cells.get(key)
+        if cell is not None:
+            cell.visits += 1
+            return False
+        cell = self.cells[key] = Cell(key, pack_state(env.get_state()), obs, score)
+        self.new_cells += 1
+        if self._best is None or score > self._best.score:
+            self._best = cell
+        if len(self.cells) > self.capacity:
+            self._evict()
+        return True
+
+    def _weights(self, cells) -> np.ndarray:
+        visits = np.fromiter((c.visits for c in cells), dtype=np.float64, count=len(cells))
+        chosen = np.fromiter((c.chosen for c in cells), dtype=np.float64, count=len(cells))
+        scores = np.fromiter((c.score for c in cells), dtype=np.float64, count=len(cells))
+        top = scores.max()
+        norm = (scores - scores.min()) / (top - scores.min()) if top > scores.min() else np.zeros_like(scores)
+        return (1 / np.sqrt(chosen + 1) + 1 / np.sqrt(visits)) * (1 + self.score_weight * norm)
+
+    def select(self, rng: np.random.Generator) -> Cell:
+        cells = list(self.cells.values())
+        weights = self._weights(cells)
+        cell = cells[rng.choice(len(cells), p=weights / weights.sum())]
+        cell.chosen += 1
+        return cell
+
+    def restore(self, env, cell: Cell) -> None:
+        env.set_state(unpack_state(cell.snapshot))
+
+    def _evict(self) -> None:
+        cells = [c for c in self.cells.values() if c is not self._best]
+        victim = cells[int(np.argmin(self._weights(cells)))]
+        del self.cells[victim.key]
+        self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cells": len(self.cells),
+            "new_cells": self.new_cells,
+            "evictions": self.evictions,
+            "best_score": self._best.score if self._best else 0,
+        }
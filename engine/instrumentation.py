@@ -0,0 +1,150 @@
+import cProfile
+import json
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Optional
+
+
+class _Timer:
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self, keep: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=keep)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 6),
+            "mean_ms": round(1000 * self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(1000 * pick(0.50), 3),
+            "p99_ms": round(1000 * pick(0.99), 3),
+            "max_ms": round(1000 * self.max, 3),
+        }
+
+
+class Instrumentation:
+    """
+    Timers and counters for one engine run.
+
+    - timers: per graph node ("node.reason", ...) and per LLM call
+      ("llm.call"), each with running totals and a bounded sample window
+      for p50/p99;
+    - counters: env steps, prompt/completion tokens, LLM calls, ...;
+    - export: every `export_every` env steps the snapshot is appended to
+      `export_path` as a JSON line, or rewritten in Prometheus text format;
+    - profiling: with `profile_steps` > 0, cProfile runs for that many env
+      steps and the stats are dumped to `profile_path`;
+    - providers: named callables returning dicts (e.g. live run metrics)
+      that are included in every export.
+    """
+    def __init__(
+        self,
+        export_path: Optional[str] = None,
+        export_every: int = 100,
+        export_format: str = "jsonl",
+        profile_steps: int = 0,
+        profile_path: str = "profile.out",
+        samples: int = 2048
+    ):
+        if export_format not in ("jsonl", "prometheus"):
+            raise ValueError(f"Unknown export format '{export_format}'")
+        self.export_path = export_path
+        self.export_every = export_every
+        self.export_format = export_format
+        self.profile_path = profile_path
+        self.timers: Dict[str, _Timer] = defaultdict(lambda: _Timer(samples))
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self.started = time.time()
+        self._profile_left = profile_steps
+        self._profiler = None
+        if profile_steps > 0:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name].add(time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.timers[name].add(seconds)
+
+    def add_provider(self, name: str, fn: Callable[[], Dict[str, Any]]) -> None:
+        self.providers[name] = fn
+
+    def incr(self, name: str, amount: float = 1) -> None:
+        self.counters[name] += amount
+
+    def step(self) -> None:
+        """Call once per env step: counts it, drives profiling and export."""
+        self.counters["env_steps"] += 1
+        steps = int(self.counters["env_steps"])
+        if self._profiler is not None:
+            self._profile_left -= 1
+            if self._profile_left <= 0:
+                self._profiler.disable()
+                self._profiler.dump_stats(self.profile_path)
+                self._profiler = None
+                print(f"[Instrumentation] cProfile stats written to {self.profile_path}")
+        if self.export_path and self.export_every and steps % self.export_every == 0:
+            self.export()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "time": time.time(),
+            "uptime_s": round(time.time() - self.started, 3),
+            "counters": dict(self.counters),
+            "timers": {name: t.summary() for name, t in self.timers.items()},
+            **{name: fn() for name, fn in self.providers.items()},
+        }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            metric = f"zorkinator_{_metric_name(name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, t in sorted(self.timers.items()):
+            metric = f"zorkinator_{_metric_name(name)}_seconds"
+            lines += [
+                f"# TYPE {metric} summary",
+                f'{metric}{{quantile="0.5"}} {t.summary()["p50_ms"] / 1000}',
+                f'{metric}{{quantile="0.99"}} {t.summary()["p99_ms"] / 1000}',
+                f"{metric}_sum {t.total}",
+                f"{metric}_count {t.count}",
+            ]
+        for prefix, fn in sorted(self.providers.items()):
+            for name, value in sorted(fn().items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metric = f"zorkinator_{_metric_name(prefix)}_{_metric_name(name)}"
+                    lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> None:
+        if not self.export_path:
+            return
+        if self.export_format == "prometheus":
+            with open(self.export_path, "w") as f:
+                f.write(self.to_prometheus())
+        else:
+            with open(self.export_path, "a") as f:
+                f.write(json.dumps(self.snapshot()) + "\n")
+
+
+def _metric_name(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name)
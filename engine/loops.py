@@ -0,0 +1,125 @@
+"""
+Cycle detection over (observation, action) trajectories.
+
+Observations and actions are interned to integer symbols and the last
+`window` symbols are kept in a NumPy ring buffer. For every candidate period
+p <= window / 2 the detector keeps a streak: how many of the latest symbols
+match the symbol p steps before them (a[t] == a[t - p]). A push updates all
+streaks with one vectorized comparison against the ring, so no period is
+missed when a symbol repeats inside a cycle. A cycle of period p is reported
+once the last `min_repeats` * p symbols are p-periodic; the shortest such
+period is returned. Memory stays bounded: the ring and the streak array have
+fixed sizes, and the symbol table is reset when it reaches `max_symbols`.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import random
+from collections import ChainMap
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from engine.core import AgentState
+
+
+class CycleDetector:
+    def __init__(self, window: int = 512, min_repeats: int = 2, max_symbols: int = 1 << 16):
+        self.window = window
+        self.min_repeats = min_repeats
+        self.max_symbols = max_symbols
+        self.cycles_detected = 0
+        self._symbols: Dict[Tuple[int, str], int] = {}
+        # candidate periods 1..window // 2 and the streak each needs
+        self._periods = np.arange(1, window // 2 + 1, dtype=np.int64)
+        self._needed = self._periods * (min_repeats - 1)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._symbols.clear()
+        self._next_symbol = 0
+        self._ring = np.full(self.window, -1, dtype=np.int64)
+        self._streaks = np.zeros(len(self._periods), dtype=np.int64)
+        self._t = 0
+
+    @staticmethod
+    def _key(obs: str, action: str) -> Tuple[int, str]:
+        # stable across processes, unlike hash(), so checkpoints stay valid
+        digest = hashlib.blake2b(obs.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little"), action
+
+    def intern(self, obs: str, action: str) -> int:
+        key = self._key(obs, action)
+        sym = self._symbols.get(key)
+        if sym is None:
+            if self._next_symbol >= self.max_symbols:
+                self._reset()
+            sym = self._symbols[key] = self._next_symbol
+            self._next_symbol += 1
+        return sym
+
+    def fork(self) -> "CycleDetector":
+        """
+        Independent copy for simulated steps: the ring and streaks are copied
+        (O(window)); the symbol table is shared read-only, with new symbols
+        going to a layer of the fork's own.
+        """
+        child = copy.copy(self)
+        child._ring = self._ring.copy()
+        child._streaks = self._streaks.copy()
+        child._symbols = ChainMap({}, self._symbols)
+        return child
+
+    def _advance(self, sym: int) -> np.ndarray:
+        """Per-period streaks after appending `sym`, without mutating."""
+        # slots not yet written hold -1, which never equals a symbol
+        earlier = self._ring[(self._t - self._periods) % self.window]
+        return np.where(earlier == sym, self._streaks + 1, 0)
+
+    def _period(self, streaks: np.ndarray) -> int:
+        hits = np.flatnonzero(streaks >= self._needed)
+        return int(self._periods[hits[0]]) if hits.size else 0
+
+    def would_cycle(self, obs: str, action: str) -> bool:
+        """True if taking `action` now would complete a detected cycle."""
+        sym = self._symbols.get(self._key(obs, action))
+        return sym is not None and self._period(self._advance(sym)) > 0
+
+    def push(self, obs: str, action: str) -> int:
+        """Append one step; returns the shortest detected cycle period, or 0."""
+        sym = self.intern(obs, action)
+        self._streaks = self._advance(sym)
+        self._ring[self._t % self.window] = sym
+        self._t += 1
+
+        period = self._period(self._streaks)
+        if period:
+            self.cycles_detected += 1
+        return period
+
+
+class CycleBreaker:
+    """
+    Action override (same avoid_loop() interface as the legacy
+    LoopHeuristic): if the proposed action would close a cycle, substitute
+    a fallback action that does not.
+    """
+    FALLBACK = ["north", "south", "east", "west", "up", "down", "look", "inventory"]
+
+    def __init__(self, window: int = 512, min_repeats: int = 2, fallback: Optional[List[str]] = None):
+        self.detector = CycleDetector(window=window, min_repeats=min_repeats)
+        self.fallback = fallback or self.FALLBACK
+        self.overrides = 0
+
+    def avoid_loop(self, state: AgentState, action: str) -> str:
+        obs = state["obs"]
+        if self.detector.would_cycle(obs, action):
+            options = [a for a in self.fallback if a != action and not self.detector.would_cycle(obs, a)]
+            if options:
+                action = random.choice(options)
+                self.overrides += 1
+        self.detector.push(obs, action)
+        return action
@@ -0,0 +1,115 @@
+import threading
+from collections import deque
+from itertools import islice
+from typing import Callable, Deque, Iterable, List, Optional
+
+
+def summarize_segment(lines: List[str]) -> str:
+    """
+    Cheap, model-free summary of an evicted segment: how many turns it held
+    and the distinct commands issued, in order of first use.
+    """
+    actions = list(dict.fromkeys(l[2:] for l in lines if l.startswith("> ")))
+    shown = ", ".join(actions[:8]) + (", …" if len(actions) > 8 else "")
+    return f"[Summary] {len(actions)} distinct commands over {len(lines)} lines: {shown}"
+
+
+# ──────────────────────────────────────────────────────────────────────
+# MemoryStore: ring buffer of recent lines + summaries of older segments
+# ──────────────────────────────────────────────────────────────────────
+class MemoryStore:
+    """
+    Bounded agent memory.
+
+    - the most recent `window` lines are kept verbatim in a ring buffer;
+    - lines pushed out of the window are grouped into segments of
+      `segment_size` lines, each reduced to one line by `summarizer`;
+    - only the newest `max_summaries` summaries are retained;
+    - if `spill_path` is set, evicted lines are appended to that file so
+      the full history survives on disk without living in RAM.
+
+    Reads and writes are serialized so concurrent graph branches can share
+    one store.
+    """
+    def __init__(
+        self,
+        window: int = 200,
+        segment_size: int = 100,
+        max_summaries: int = 20,
+        spill_path: Optional[str] = None,
+        summarizer: Callable[[List[str]], str] = summarize_segment
+    ):
+        self.window = window
+        self.segment_size = segment_size
+        self.summarizer = summarizer
+        self.lines: Deque[str] = deque(maxlen=window)
+        self.summaries: Deque[str] = deque(maxlen=max_summaries)
+        self.total_lines = 0
+        self._segment: List[str] = []
+        self._lock = threading.Lock()
+        self.spill_path = spill_path
+        self._spill = open(spill_path, "a") if spill_path else None
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def append(self, line: str) -> None:
+        with self._lock:
+            self._append(line)
+
+    def extend(self, lines: Iterable[str]) -> None:
+        with self._lock:
+            for line in lines:
+                self._append(line)
+
+    def tail(self, n: int) -> List[str]:
+        """Return the last n retained lines (at most `window`)."""
+        with self._lock:
+            n = min(n, len(self.lines))
+            if n <= 0:
+                return []
+            return list(islice(self.lines, len(self.lines) - n, None))
+
+    def render(self) -> str:
+        """Summaries of older segments followed by the verbatim window."""
+        with self._lock:
+            return "\n".join([*self.summaries, *self.lines])
+
+    def close(self) -> None:
+        with self._lock:
+            if self._spill:
+                self._flush_segment()
+                self._spill.close()
+                self._spill = None
+
+    def __getstate__(self):
+        # locks and open files do not pickle; they are recreated on load
+        with self._lock:
+            state = dict(self.__dict__)
+        del state["_lock"], state["_spill"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._spill = open(self.spill_path, "a") if self.spill_path else None
+
+    def _append(self, line: str) -> None:
+        if len(self.lines) == self.window:
+            self._evict(self.lines[0])
+        self.lines.append(line)
+        self.total_lines += 1
+
+    def _evict(self, line: str) -> None:
+        self._segment.append(line)
+        if len(self._segment) >= self.segment_size:
+            self._flush_segment()
+
+    def _flush_segment(self) -> None:
+        if not self._segment:
+            return
+        self.summaries.append(self.summarizer(self._segment))
+        if self._spill:
+            self._spill.write("\n".join(self._segment) + "\n")
+            self._spill.flush()
+        self._segment = []
@@ -0,0 +1,114 @@
+"""
+Shared prompt construction with per-component token budgets.
+
+A PromptTemplate is compiled once: the format string is split into literal
+and field pieces and the token cost of the literal text is precomputed.
+Rendering fits the variable fields into the remaining budget with a fast
+local estimate (a regex that splits text into word pieces of at most six
+characters, which tracks BPE token counts closely and slightly
+over-counts, so budgets stay conservative).
+
+The system prompt always comes first and never depends on the step, so
+consecutive calls share an identical prefix and the server can reuse its
+KV/prefix cache for it; everything that changes per call comes after.
+"""
+
+import re
+import string
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple, Union
+
+_PIECE = re.compile(r"\w{1,6}|[^\w\s]")
+
+# default prompt budgets in estimated tokens, per component role
+DEFAULT_BUDGETS = {"reasoner": 768, "evaluator": 384, "reflector": 512}
+
+# truncation policies for budgeted fields
+HEAD = "head"   # keep leading lines (e.g. an observation)
+TAIL = "tail"   # keep trailing lines (e.g. recent transcript)
+LIST = "list"   # keep leading items, joined with ", " (e.g. valid actions)
+
+FieldValue = Union[str, int, Sequence[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(_PIECE.findall(text))
+
+
+class PromptTemplate:
+    """
+    `system` + blank line + `body`, where `body` is a str.format template.
+    Fields named in `trim` (in priority order) are cut to fit the budget
+    using the given policy; all other fields are inserted verbatim.
+    """
+    def __init__(self, system: str, body: str, trim: Dict[str, str] = None):
+        self.system = system
+        self.trim = dict(trim or {})
+        self._pieces: List[Tuple[str, str]] = [
+            (literal, field or "") for literal, field, _, _ in string.Formatter().parse(body)
+        ]
+        self._prefix = f"{system}\n\n"
+        self._static_cost = estimate_tokens(self._prefix) + sum(
+            estimate_tokens(literal) for literal, _ in self._pieces
+        )
+        self.truncations = 0
+
+    def render(self, budget: int, **values: FieldValue) -> str:
+        rendered = {name: _join(v) for name, v in values.items() if name not in self.trim}
+        remaining = budget - self._static_cost - sum(map(estimate_tokens, rendered.values()))
+        for name, policy in self.trim.items():
+            text, cost, cut = _fit(values.get(name, ""), policy, max(remaining, 0))
+            self.truncations += cut
+            rendered[name] = text
+            remaining -= cost
+        return self._prefix + "".join(
+            literal + (rendered[field] if field else "") for literal, field in self._pieces
+        )
+
+
+@lru_cache(maxsize=None)
+def compile_template(system: str, body: str, trim: Tuple[Tuple[str, str], ...] = ()) -> PromptTemplate:
+    """Shared, precompiled template for a (system, body, trim) combination."""
+    return PromptTemplate(system, body, dict(trim))
+
+
+def _join(value: FieldValue) -> str:
+    if isinstance(value, (list, tuple)):
+        return "\n".join(value)
+    return str(value)
+
+
+def _clip(text: str, budget: int, from_end: bool = False) -> str:
+    if budget <= 0:
+        return ""
+    pieces = list(_PIECE.finditer(text))
+    if from_end:
+        return text[pieces[-budget].start():]
+    return text[:pieces[budget - 1].end()]
+
+
+def _fit(value: FieldValue, policy: str, budget: int) -> Tuple[str, int, bool]:
+    """Cut `value` to at most `budget` tokens; returns (text, cost, truncated)."""
+    if policy == LIST:
+        items = value.split(", ") if isinstance(value, str) else list(value)
+        sep = 1
+    else:
+        items = value.splitlines() if isinstance(value, str) else list(value)
+        sep = 0
+        if policy == TAIL:
+            items.reverse()
+    kept, cost, cut = [], 0, False
+    for item in items:
+        c = estimate_tokens(item) + (sep if kept else 0)
+        if cost + c > budget:
+            if not kept and policy != LIST:
+                # a single oversized line: keep as many pieces of it as fit
+                kept.append(_clip(item, budget, from_end=policy == TAIL))
+                cost = budget
+            cut = True
+            break
+        kept.append(item)
+        cost += c
+    if policy == TAIL:
+        kept.reverse()
+    return (", " if policy == LIST else "\n").join(kept), cost, cut
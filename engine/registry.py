@@ -0,0 +1,93 @@
+"""
+Lazy registry of pluggable components.
+
+Components are named in the config by class name only (`reasoner:
+LLMReasoner`); the module that defines each role is imported the first time
+a component of that role is resolved, so code paths that never build an
+engine never import the component modules (and their jericho / NumPy /
+requests dependencies).
+
+`validate` checks a component's constructor against the options it will be
+given before anything expensive is built, so a typo in a class or option
+name fails at startup with a clear message rather than silently falling
+back to defaults.
+"""
+
+import importlib
+import inspect
+from typing import Any, Dict, List, Optional
+
+ROLES = {
+    "reasoner": "engine.components.reasoners",
+    "evaluator": "engine.components.evaluators",
+    "reflector": "engine.components.reflectors",
+}
+# interface method that marks a class in a role module as a component
+_ROLE_METHODS = {"reasoner": "choose_action", "evaluator": "evaluate", "reflector": "reflect"}
+
+
+def resolve(role: str, name: str) -> type:
+    """Import the role's module on first use and return the named class."""
+    if role not in ROLES:
+        raise ValueError(f"Unknown component role '{role}'; expected one of {tuple(ROLES)}")
+    if "." in name:
+        module_path, cls_name = name.rsplit(".", 1)
+    else:
+        module_path, cls_name = ROLES[role], name
+    module = importlib.import_module(module_path)
+    cls = getattr(module, cls_name, None)
+    if not inspect.isclass(cls):
+        raise ValueError(
+            f"Unknown {role} '{name}'; available: {', '.join(available(role))}"
+        )
+    return cls
+
+
+def available(role: str) -> List[str]:
+    """Component class names defined in the role's module."""
+    module = importlib.import_module(ROLES[role])
+    method = _ROLE_METHODS[role]
+    return sorted(
+        name for name, obj in vars(module).items()
+        if inspect.isclass(obj) and obj.__module__ == module.__name__
+        and method in vars(obj) and not getattr(obj, "_is_protocol", False)
+    )
+
+
+def signature_params(role: str, name: str) -> List[str]:
+    return list(inspect.signature(resolve(role, name)).parameters)
+
+
+def validate(role: str, name: str, options: Optional[Dict[str, Any]] = None) -> inspect.BoundArguments:
+    """
+    Resolve a component and bind `options` (plus a client, if the
+    constructor takes one) to its signature. Raises ValueError naming the
+    component and the offending or missing options.
+    """
+    cls = resolve(role, name)
+    options = dict(options or {})
+    signature = inspect.signature(cls)
+    params = signature.parameters
+    if "client" in params and "client" not in options:
+        options["client"] = None
+    accepts_kwargs = any(p.kind is p.VAR_KEYWORD for p in params.values())
+    unknown = [k for k in options if k not in params and not accepts_kwargs]
+    if unknown:
+        raise ValueError(
+            f"{role} {name} does not accept {unknown}; "
+            f"options: {[p for p in params if p != 'client']}"
+        )
+    try:
+        return signature.bind(**options)
+    except TypeError as e:
+        raise ValueError(f"{role} {name}: {e} (set it under {role}_options)") from None
+
+
+def create(role: str, name: str, client=None, options: Optional[Dict[str, Any]] = None):
+    """Instantiate a validated component, passing `client` only if it takes one."""
+    cls = resolve(role, name)
+    options = dict(options or {})
+    if "client" in inspect.signature(cls).parameters:
+        options["client"] = client
+    validate(role, name, options)
+    return cls(**options)
@@ -0,0 +1,297 @@
+"""
+Compact, append-only trajectory logs.
+
+A log is a directory:
+
+    meta.json     game file, seed, component config (plus the resolved run
+                  config and its hash), initial observation id
+    steps.bin     fixed-size little-endian records, one per env step
+    strings.bin   UTF-8 bytes of every distinct action / observation
+    strings.idx   (offset, length) int64 pairs into strings.bin
+    restores.bin  optional pickled (before_step, packed env state, obs id)
+                  records for env jumps that are not steps (Go-Explore
+                  restores), so replay can reproduce them
+
+Actions and observations are interned, so a revisited room costs four bytes
+per step instead of its full text. Records have a fixed size, so step N
+lives at byte N * RECORD.size and the reader maps the files instead of
+parsing them.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from engine.explore import pack_state, unpack_state
+from engine.transcript import Step
+
+FORMAT_VERSION = 1
+RECORD = struct.Struct("<IIIifIB")   # step, action, obs, score, reward, moves, done
+STEP_DTYPE = np.dtype([
+    ("step", "<u4"), ("action", "<u4"), ("obs", "<u4"), ("score", "<i4"),
+    ("reward", "<f4"), ("moves", "<u4"), ("done", "u1"),
+])
+assert STEP_DTYPE.itemsize == RECORD.size
+
+
+def config_hash(config: Dict) -> str:
+    """
+    Stable short hash of a resolved run config. The seed and output
+    locations (`*_path` / `*_dir` keys) are left out, so every episode of
+    a batch sweep shares one hash.
+    """
+    def strip(value):
+        if isinstance(value, dict):
+            return {k: strip(v) for k, v in value.items()
+                    if k != "seed" and not k.endswith(("_path", "_dir"))}
+        if isinstance(value, list):
+            return [strip(v) for v in value]
+        return value
+
+    blob = json.dumps(strip(config), sort_keys=True, default=str)
+    return hashlib.blake2b(blob.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def _read_restores(path: str) -> List[tuple]:
+    records = []
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    records.append(pickle.load(f))
+                except (EOFError, pickle.UnpicklingError):
+                    break   # end of file, or a record torn by a crash
+    return records
+
+
+class TrajectoryWriter:
+    """
+    Streams steps to a log directory; flushes every `flush_every` steps.
+
+    With `resume` an existing log in `directory` is continued: the interned
+    strings, offsets and step count are reloaded and new records are
+    appended. truncate() then drops the records a resumed run will redo.
+    """
+    def __init__(self, directory: str, game_file: str, initial_obs: str,
+                 seed: Optional[int] = None, config: Optional[Dict] = None,
+                 flush_every: int = 64, resume: bool = False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_every = flush_every
+        self._ids: Dict[str, int] = {}
+        self._offset = 0
+        self._count = 0
+        self._restores_path = os.path.join(directory, "restores.bin")
+        self._restores = None
+        paths = [os.path.join(directory, name) for name in ("strings.bin", "strings.idx", "steps.bin")]
+        resume = resume and os.path.exists(os.path.join(directory, "meta.json"))
+        if resume:
+            self._load()
+        else:
+            for path in paths:
+                open(path, "wb").close()
+            if os.path.exists(self._restores_path):
+                os.remove(self._restores_path)
+        self._strings, self._index, self._steps = (open(path, "ab") for path in paths)
+        if not resume:
+            self.meta = {
+                "version": FORMAT_VERSION,
+                "game_file": game_file,
+                "seed": seed,
+                "config": config or {},
+                "initial_obs": self.intern(initial_obs),
+                "steps": 0,
+            }
+            self._write_meta()
+
+    def _load(self) -> None:
+        with open(os.path.join(self.directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported trajectory format {self.meta.get('version')}")
+        strings_path = os.path.join(self.directory, "strings.bin")
+        index_path = os.path.join(self.directory, "strings.idx")
+        steps_path = os.path.join(self.directory, "steps.bin")
+        with open(strings_path, "rb") as f:
+            blob = f.read()
+        index = np.fromfile(index_path, dtype="<i8")
+        index = index[:len(index) - len(index) % 2].reshape(-1, 2)
+        # drop index entries whose bytes never reached strings.bin
+        index = index[index.sum(axis=1) <= len(blob)]
+        self._ids = {blob[o:o + n].decode("utf-8"): i for i, (o, n) in enumerate(index.tolist())}
+        self._offset = int(index[-1].sum()) if len(index) else 0
+        self._count = os.path.getsize(steps_path) // RECORD.size
+        # cut torn tails left by a crash mid-write
+        for path, size in ((strings_path, self._offset), (index_path, index.nbytes),
+                           (steps_path, self._count * RECORD.size)):
+            os.truncate(path, size)
+
+    @property
+    def steps_written(self) -> int:
+        return self._count
+
+    def truncate(self, steps: int) -> None:
+        """Drop the records after the first `steps` (e.g. those a resumed run redoes)."""
+        if steps >= self._count:
+            return
+        self._steps.flush()
+        self._steps.truncate(steps * RECORD.size)
+        self._count = steps
+        self.meta["steps"] = steps
+        self._write_meta()
+        # jumps taken at or after that step are redone as well
+        kept = [r for r in _read_restores(self._restores_path) if r[0] < steps]
+        if self._restores is not None:
+            self._restores.close()
+            self._restores = None
+        with open(self._restores_path, "wb") as f:
+            for record in kept:
+                pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def intern(self, text: str) -> int:
+        sid = self._ids.get(text)
+        if sid is None:
+            data = text.encode("utf-8")
+            sid = self._ids[text] = len(self._ids)
+            self._strings.write(data)
+            self._index.write(struct.pack("<qq", self._offset, len(data)))
+            self._offset += len(data)
+        return sid
+
+    def log(self, step: Step, reward: float = 0.0, moves: int = 0) -> None:
+        self._steps.write(RECORD.pack(
+            self._count, self.intern(step.action), self.intern(step.obs),
+            step.score, reward, moves, step.done
+        ))
+        self._count += 1
+        if self._count % self.flush_every == 0:
+            self.flush()
+
+    def log_restore(self, env_state: tuple, obs: str) -> None:
+        """Record a jump of the env to `env_state` before the next step."""
+        if self._restores is None:
+            self._restores = open(self._restores_path, "ab")
+        record = (self._count, pack_state(env_state), self.intern(obs))
+        pickle.dump(record, self._restores, protocol=pickle.HIGHEST_PROTOCOL)
+        self._restores.flush()
+
+    def flush(self) -> None:
+        # strings before records, so a reader never sees a dangling id
+        self._strings.flush()
+        self._index.flush()
+        self._steps.flush()
+        self.meta["steps"] = self._count
+        self._write_meta()
+
+    def close(self) -> None:
+        self.flush()
+        for f in (self._strings, self._index, self._steps, self._restores):
+            if f is not None:
+                f.close()
+
+    def _write_meta(self) -> None:
+        path = os.path.join(self.directory, "meta.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.meta, f)
+        os.replace(path + ".tmp", path)
+
+
+class TrajectoryLog:
+    """
+    Read-only, memory-mapped view of a log. `steps` is a NumPy record array
+    (columns: step, action, obs, score, reward, moves, done); `log[n]`
+    decodes step n.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported trajectory format {self.meta.get('version')}")
+        steps_path = os.path.join(directory, "steps.bin")
+        n = os.path.getsize(steps_path) // STEP_DTYPE.itemsize
+        self.steps = (np.memmap(steps_path, dtype=STEP_DTYPE, mode="r", shape=(n,))
+                      if n else np.empty(0, dtype=STEP_DTYPE))
+        self._index = np.fromfile(os.path.join(directory, "strings.idx"), dtype="<i8").reshape(-1, 2)
+        with open(os.path.join(directory, "strings.bin"), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        # before_step -> packed env states to restore before that step
+        self.restores: Dict[int, List[tuple]] = {}
+        for before, packed, _ in _read_restores(os.path.join(directory, "restores.bin")):
+            self.restores.setdefault(before, []).append(packed)
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def string(self, sid: int) -> str:
+        offset, length = self._index[sid]
+        return self._blob[offset:offset + length].decode("utf-8")
+
+    @property
+    def initial_obs(self) -> str:
+        return self.string(self.meta["initial_obs"])
+
+    def __getitem__(self, n: int) -> Dict:
+        rec = self.steps[n]
+        return {
+            "step": int(rec["step"]),
+            "action": self.string(int(rec["action"])),
+            "obs": self.string(int(rec["obs"])),
+            "score": int(rec["score"]),
+            "reward": float(rec["reward"]),
+            "moves": int(rec["moves"]),
+            "done": bool(rec["done"]),
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        for n in range(len(self)):
+            yield self[n]
+
+    def actions(self) -> List[str]:
+        return [self.string(int(a)) for a in self.steps["action"]]
+
+
+def replay(log: TrajectoryLog, game_file: Optional[str] = None, evaluator=None) -> Dict:
+    """
+    Re-execute a log's actions against a fresh FrotzEnv (same game and
+    seed) without any model calls, applying the logged env restores at the
+    same points as the live run. If `evaluator` is given it is fed each
+    replayed Step. Returns the replayed transcript, rewards, the RunMetrics
+    of the replayed steps (the same accumulator a live run reports from) and
+    the number of steps whose observation differs from the recorded one.
+    """
+    from jericho import FrotzEnv
+    from evaluator.post_run import RunMetrics
+
+    seed = log.meta.get("seed")
+    game_file = game_file or log.meta["game_file"]
+    env = FrotzEnv(game_file) if seed is None else FrotzEnv(game_file, seed=seed)
+    obs, _ = env.reset()
+    metrics = RunMetrics(obs.strip())
+    transcript, rewards, mismatches = [obs], [], 0
+    for n in range(len(log)):
+        for packed in log.restores.get(n, ()):
+            env.set_state(unpack_state(packed))
+        action = log.string(int(log.steps[n]["action"]))
+        obs, _, done, info = env.step(action)
+        obs = obs.strip()
+        if obs != log.string(int(log.steps[n]["obs"])):
+            mismatches += 1
+        transcript += [f"> {action}", obs]
+        step = Step(n, action, obs, info.get("score", 0), done)
+        reward = float(log.steps[n]["reward"])
+        if evaluator is not None:
+            reward = evaluator.update(step)
+            rewards.append(reward)
+        metrics.update(step, reward, info.get("moves"))
+        if done:
+            break
+    return {"env": env, "transcript": transcript, "rewards": rewards, "metrics": metrics,
+            "mismatches": mismatches}
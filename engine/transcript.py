@@ -0,0 +1,62 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional
+from engine.memory import MemoryStore
+
+
+# ──────────────────────────────────────────────────────────────────────
+# 1. Step: one structured (action, observation) turn
+# ──────────────────────────────────────────────────────────────────────
+@dataclass(frozen=True, slots=True)
+class Step:
+    """
+    A single executed turn, as handed to Evaluator.update().
+    """
+    index: int
+    action: str
+    obs: str
+    score: int = 0
+    done: bool = False
+
+# ──────────────────────────────────────────────────────────────────────
+# 2. Transcript: append-only log of steps and text lines
+# ──────────────────────────────────────────────────────────────────────
+class Transcript:
+    """
+    Append-only episode log. Keeps the structured steps alongside the flat
+    line view ("> action", observation lines, "[Reflection]" blocks) that
+    the list-based components consume, so nothing has to re-split a growing
+    memory string on every turn.
+
+    Both views are bounded: `memory` retains a window of lines (older ones
+    are summarized and optionally spilled to disk) and only the last
+    `step_window` Step objects are kept.
+    """
+    def __init__(self, memory: Optional[MemoryStore] = None, step_window: int = 1000):
+        self.memory = memory if memory is not None else MemoryStore()
+        self.steps: Deque[Step] = deque(maxlen=step_window)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def lines(self) -> List[str]:
+        """All retained lines, oldest first."""
+        return self.memory.tail(self.memory.window)
+
+    def append_step(self, action: str, obs: str, score: int = 0, done: bool = False) -> Step:
+        step = Step(self._count, action, obs, score, done)
+        self._count += 1
+        self.steps.append(step)
+        self.memory.append(f"> {action}")
+        self.memory.extend(obs.splitlines())
+        return step
+
+    def append_reflection(self, reflection: str) -> None:
+        self.memory.append("[Reflection]")
+        self.memory.extend(reflection.splitlines())
+
+    def tail(self, n: int) -> List[str]:
+        """Return the last n text lines."""
+        return self.memory.tail(n)
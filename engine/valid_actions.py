@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List
+
+if TYPE_CHECKING:
+    from jericho import FrotzEnv
+
+logger = logging.getLogger("zorkinator.valid_actions")
+
+
+class ValidActionCache:
+    """
+    LRU cache of env.get_valid_actions() keyed on the world-state hash.
+
+    Valid-action generation replays every candidate command against the
+    game, so it is by far the most expensive env call; states revisited
+    during an episode (or during lookahead search) are answered from the
+    cache. Generation runs in-process (use_parallel=False: Jericho's
+    default starts a multiprocessing pool per env, which daemonic batch
+    workers may not do). The ctypes fast path is used unless it fails, after
+    which the cache permanently falls back to the pure-Python path. A state
+    whose generation fails is cached as having no valid actions; the first
+    failure is logged and all are counted in stats().
+    """
+    def __init__(self, capacity: int = 4096, use_ctypes: bool = True):
+        self.capacity = capacity
+        self.use_ctypes = use_ctypes
+        self.hits = 0
+        self.misses = 0
+        self.generation_time = 0.0
+        self.failures = 0
+        self._cache: "OrderedDict[str, List[str]]" = OrderedDict()
+
+    def get(self, env: FrotzEnv) -> List[str]:
+        key = env.get_world_state_hash()
+        actions = self._cache.get(key)
+        if actions is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return list(actions)
+
+        self.misses += 1
+        start = time.perf_counter()
+        try:
+            actions = self._generate(env)
+        except Exception as e:
+            if not self.failures:
+                logger.warning("Valid-action generation failed (%r); "
+                               "treating such states as having no valid actions", e)
+            self.failures += 1
+            actions = []
+        finally:
+            self.generation_time += time.perf_counter() - start
+
+        self._cache[key] = actions
+        if len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+        return list(actions)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "generation_time": round(self.generation_time, 3),
+            "mean_generation_time": round(self.generation_time / self.misses, 4) if self.misses else None,
+            "failures": self.failures,
+        }
+
+    def _generate(self, env: FrotzEnv) -> List[str]:
+        if self.use_ctypes:
+            try:
+                return env.get_valid_actions(use_ctypes=True, use_parallel=False)
+            except Exception as e:
+                logger.warning("ctypes valid-action generation failed (%r); using the Python path", e)
+                self.use_ctypes = False
+        return env.get_valid_actions(use_ctypes=False, use_parallel=False)
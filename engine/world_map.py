@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import json
+from array import array
+from collections import deque
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from jericho import FrotzEnv
+
+
+DIRECTIONS = {
+    "n": "north", "s": "south", "e": "east", "w": "west",
+    "ne": "northeast", "nw": "northwest", "se": "southeast", "sw": "southwest",
+    "u": "up", "d": "down",
+}
+MOVES = set(DIRECTIONS.values()) | {"in", "out", "enter", "exit"}
+REVERSE_DIRECTIONS = {
+    "north": "south", "south": "north", "east": "west", "west": "east",
+    "northeast": "southwest", "southwest": "northeast",
+    "northwest": "southeast", "southeast": "northwest",
+    "up": "down", "down": "up", "in": "out", "out": "in",
+}
+
+
+def normalize_move(action: str) -> Optional[str]:
+    """Canonical direction for a movement command, or None if it is not one."""
+    words = action.lower().split()
+    if words[:1] == ["go"]:
+        words = words[1:]
+    if len(words) != 1:
+        return None
+    move = DIRECTIONS.get(words[0], words[0])
+    return move if move in MOVES else None
+
+
+class WorldMap:
+    """
+    Indexed graph of discovered rooms.
+
+    Rooms and movement commands are interned to small integers; room keys
+    come from the Z-machine player location when the env exposes it, else
+    from the first observation line. Every transition is appended to a flat
+    int32 array of (src, move, dst) triples, one per known (room, move),
+    which is also the persisted form; `adjacency` is the per-room index
+    rebuilt from it.
+    """
+    def __init__(self):
+        self.room_names: List[str] = []
+        self.move_names: List[str] = []
+        self._room_ids: Dict[str, int] = {}
+        self._move_ids: Dict[str, int] = {}
+        self.adjacency: List[Dict[int, int]] = []
+        self.untried: List[Set[int]] = []
+        self.edges = array("i")
+        self._edge_pos: Dict[Tuple[int, int], int] = {}
+
+    # ── interning ─────────────────────────────────────────────────────
+    def room_id(self, env: FrotzEnv, obs: str) -> int:
+        try:
+            location = env.get_player_location()
+            key, name = f"loc:{location.num}", location.name
+        except Exception:
+            name = obs.strip().splitlines()[0] if obs.strip() else ""
+            key = f"obs:{name}"
+        rid = self._room_ids.get(key)
+        if rid is None:
+            rid = self._room_ids[key] = len(self.room_names)
+            self.room_names.append(name)
+            self.adjacency.append({})
+            self.untried.append(set())
+        return rid
+
+    def move_id(self, move: str) -> int:
+        mid = self._move_ids.get(move)
+        if mid is None:
+            mid = self._move_ids[move] = len(self.move_names)
+            self.move_names.append(move)
+        return mid
+
+    # ── recording ─────────────────────────────────────────────────────
+    def add_exits(self, room: int, actions: Iterable[str]) -> None:
+        """Register movement commands available in `room` that were never taken."""
+        for action in actions:
+            move = normalize_move(action)
+            if move is None:
+                continue
+            mid = self.move_id(move)
+            if mid not in self.adjacency[room]:
+                self.untried[room].add(mid)
+
+    def record(self, src: int, action: str, dst: int) -> None:
+        """Record the outcome of a movement command (dst == src when blocked)."""
+        move = normalize_move(action)
+        if move is None:
+            return
+        mid = self.move_id(move)
+        self._link(src, mid, dst)
+        reverse = REVERSE_DIRECTIONS.get(move)
+        if reverse and dst != src:
+            rid = self.move_id(reverse)
+            if rid not in self.adjacency[dst]:
+                self._link(dst, rid, src)
+
+    def _link(self, src: int, mid: int, dst: int) -> None:
+        self.untried[src].discard(mid)
+        if self.adjacency[src].get(mid) == dst:
+            return
+        self.adjacency[src][mid] = dst
+        pos = self._edge_pos.get((src, mid))
+        if pos is None:
+            self._edge_pos[(src, mid)] = len(self.edges)
+            self.edges.extend((src, mid, dst))
+        else:
+            # the move now leads elsewhere: rewrite its triple in place
+            self.edges[pos + 2] = dst
+
+    # ── queries ───────────────────────────────────────────────────────
+    def has_frontier(self, room: int) -> bool:
+        return bool(self.untried[room])
+
+    def path_to(self, src: int, dst: int) -> Optional[List[Tuple[str, int]]]:
+        """Shortest known route as [(move, expected_room), ...]."""
+        return self._bfs(src, lambda r: r == dst)
+
+    def path_to_frontier(self, src: int) -> Optional[List[Tuple[str, int]]]:
+        """Shortest route to the nearest other room with untried exits."""
+        return self._bfs(src, lambda r: r != src and bool(self.untried[r]))
+
+    def _bfs(self, src: int, is_goal) -> Optional[List[Tuple[str, int]]]:
+        parent: Dict[int, Tuple[int, int]] = {src: (-1, -1)}
+        queue = deque([src])
+        while queue:
+            room = queue.popleft()
+            if is_goal(room):
+                path = []
+                while room != src:
+                    prev, mid = parent[room]
+                    path.append((self.move_names[mid], room))
+                    room = prev
+                return path[::-1]
+            for mid, nxt in self.adjacency[room].items():
+                if nxt not in parent:
+                    parent[nxt] = (room, mid)
+                    queue.append(nxt)
+        return None
+
+    # ── persistence ───────────────────────────────────────────────────
+    def save(self, path: str) -> None:
+        header = {
+            "rooms": list(self._room_ids.items()),
+            "names": self.room_names,
+            "moves": self.move_names,
+            "untried": [sorted(u) for u in self.untried],
+        }
+        with open(path, "wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            self.edges.tofile(f)
+
+    @classmethod
+    def load(cls, path: str) -> "WorldMap":
+        world = cls()
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            edges = array("i", f.read())
+        world._room_ids = dict(header["rooms"])
+        world.room_names = header["names"]
+        for move in header["moves"]:
+            world.move_id(move)
+        world.adjacency = [{} for _ in world.room_names]
+        world.untried = [set(u) for u in header["untried"]]
+        for i in range(0, len(edges), 3):
+            src, mid, dst = edges[i:i + 3]
+            pos = world._edge_pos.get((src, mid))
+            if pos is None:
+                world._edge_pos[(src, mid)] = len(world.edges)
+                world.edges.extend((src, mid, dst))
+            else:
+                # maps saved before edges were deduplicated: last one wins
+                world.edges[pos + 2] = dst
+            world.adjacency[src][mid] = dst
+        return world
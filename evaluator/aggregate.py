@@ -0,0 +1,239 @@
+# evaluator/aggregate.py
+"""
+Cross-episode analysis over a directory of trajectory logs.
+
+Every subdirectory containing a meta.json is one episode (as written by
+`trajectory_dir`, including the per-episode directories of batch mode).
+Episodes are reduced to one row each in parallel, grouped by run config
+(reasoner/evaluator/reflector/topology from meta.json, plus the hash of the
+resolved config when the log records one) and summarised with NumPy:
+
+    - final score: mean and 95% confidence interval;
+    - steps-to-score-k: mean first step reaching score k, and the share of
+      episodes that reached it at all;
+    - exploration rate: distinct rooms per env step.
+
+Per-episode rows are cached column-wise in `<dir>/.aggregate.npz`, keyed by
+path, size and mtime of steps.bin, so re-running after new episodes land
+only reads the new or still-growing logs.
+
+    python -m evaluator.aggregate runs/ --k 10 25 50 --csv summary.csv
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from engine.trajlog import TrajectoryLog
+
+CACHE_NAME = ".aggregate.npz"
+CONFIG_KEYS = ("reasoner", "evaluator", "reflector", "topology")
+Z_95 = 1.96
+
+
+def find_logs(root: str) -> List[str]:
+    return sorted(
+        dirpath for dirpath, _, files in os.walk(root)
+        if "meta.json" in files and "steps.bin" in files
+    )
+
+
+def _signature(directory: str) -> Tuple[int, float]:
+    st = os.stat(os.path.join(directory, "steps.bin"))
+    return st.st_size, st.st_mtime
+
+
+def config_label(meta: Dict) -> str:
+    config = meta.get("config") or {}
+    label = "/".join(str(config.get(k, "?")) for k in CONFIG_KEYS)
+    return f"{label}#{config['hash']}" if config.get("hash") else label
+
+
+def summarize_log(directory: str, ks: Sequence[int]) -> Dict:
+    """Reduce one episode to a row of scalars (runs in a worker process)."""
+    log = TrajectoryLog(directory)
+    steps = log.steps
+    n = len(steps)
+    score = np.asarray(steps["score"], dtype=np.int64)
+    # a room is the first line of an observation; only distinct ids are decoded
+    obs_ids = np.unique(np.asarray(steps["obs"]))
+    rooms = {log.string(int(i)).split("\n", 1)[0] for i in obs_ids}
+    rooms.add(log.initial_obs.split("\n", 1)[0])
+
+    to_k = np.full(len(ks), np.nan)
+    for j, k in enumerate(ks):
+        hit = np.flatnonzero(score >= k)
+        if hit.size:
+            to_k[j] = hit[0] + 1
+    return {
+        "path": directory,
+        "config": config_label(log.meta),
+        "steps": n,
+        "score": int(score[-1]) if n else 0,
+        "max_score": int(score.max()) if n else 0,
+        "rooms": len(rooms),
+        "done": bool(steps["done"][-1]) if n else False,
+        "steps_to_k": to_k,
+    }
+
+
+class AggregateCache:
+    """Column store of per-episode rows, persisted as one .npz file."""
+    COLUMNS = ("path", "config", "size", "mtime", "steps", "score",
+               "max_score", "rooms", "done", "steps_to_k")
+
+    def __init__(self, path: Optional[str], ks: Sequence[int]):
+        self.path = path
+        self.ks = np.asarray(ks, dtype=np.int64)
+        self.rows: Dict[str, Dict] = {}
+        if path and os.path.exists(path):
+            with np.load(path, allow_pickle=False) as data:
+                # a different k list invalidates the steps-to-k column
+                if np.array_equal(data["ks"], self.ks):
+                    cols = {c: data[c] for c in self.COLUMNS}
+                    for i, p in enumerate(cols["path"]):
+                        self.rows[str(p)] = {c: cols[c][i] for c in self.COLUMNS}
+
+    def fresh(self, directory: str, signature: Tuple[int, float]) -> bool:
+        row = self.rows.get(directory)
+        return row is not None and (int(row["size"]), float(row["mtime"])) == signature
+
+    def put(self, row: Dict, signature: Tuple[int, float]) -> None:
+        row["size"], row["mtime"] = signature
+        self.rows[row["path"]] = row
+
+    def columns(self, paths: Sequence[str]) -> Dict[str, np.ndarray]:
+        rows = [self.rows[p] for p in paths]
+        cols = {c: np.array([r[c] for r in rows]) for c in self.COLUMNS if c != "steps_to_k"}
+        cols["steps_to_k"] = np.array([r["steps_to_k"] for r in rows], dtype=np.float64)\
+            .reshape(len(rows), len(self.ks))
+        return cols
+
+    def save(self, paths: Sequence[str]) -> None:
+        if not self.path:
+            return
+        cols = self.columns(paths)
+        tmp = self.path + ".tmp.npz"
+        np.savez(tmp, ks=self.ks, **{c: cols[c] for c in self.COLUMNS})
+        os.replace(tmp, self.path)
+
+
+def load_rows(root: str, ks: Sequence[int], workers: Optional[int] = None,
+              use_cache: bool = True) -> Dict[str, np.ndarray]:
+    """Columns for every episode under `root`, reading only stale logs."""
+    paths = find_logs(root)
+    cache = AggregateCache(os.path.join(root, CACHE_NAME) if use_cache else None, ks)
+    signatures = {p: _signature(p) for p in paths}
+    stale = [p for p in paths if not cache.fresh(p, signatures[p])]
+    if stale:
+        print(f"[Aggregate] Reading {len(stale)} of {len(paths)} logs")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for row in pool.map(summarize_log, stale, [ks] * len(stale), chunksize=8):
+                cache.put(row, signatures[row["path"]])
+        cache.save(paths)
+    return cache.columns(paths)
+
+
+def _mean_ci(values: np.ndarray, groups: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-group mean and 95% CI half-width (normal approximation)."""
+    counts = np.bincount(groups, minlength=n_groups)
+    sums = np.bincount(groups, weights=values, minlength=n_groups)
+    mean = sums / np.maximum(counts, 1)
+    sq = np.bincount(groups, weights=(values - mean[groups]) ** 2, minlength=n_groups)
+    std = np.sqrt(sq / np.maximum(counts - 1, 1))
+    return mean, Z_95 * std / np.sqrt(np.maximum(counts, 1))
+
+
+def aggregate(cols: Dict[str, np.ndarray], ks: Sequence[int]) -> List[Dict]:
+    """Per-config statistics over the episode columns, one dict per config."""
+    if not len(cols["path"]):
+        return []
+    configs, groups = np.unique(cols["config"], return_inverse=True)
+    g = len(configs)
+    episodes = np.bincount(groups, minlength=g)
+    score, score_ci = _mean_ci(cols["score"].astype(np.float64), groups, g)
+    steps = cols["steps"].astype(np.float64)
+    explore = cols["rooms"] / np.maximum(steps, 1)
+    explore_mean, explore_ci = _mean_ci(explore, groups, g)
+    mean_steps = np.bincount(groups, weights=steps, minlength=g) / episodes
+
+    to_k = cols["steps_to_k"]
+    reached = ~np.isnan(to_k)
+    summary = []
+    for i, config in enumerate(configs):
+        mask = groups == i
+        hits = reached[mask].sum(axis=0)
+        row = {
+            "config": str(config),
+            "episodes": int(episodes[i]),
+            "mean_steps": round(float(mean_steps[i]), 1),
+            "score_mean": round(float(score[i]), 3),
+            "score_ci95": round(float(score_ci[i]), 3),
+            "exploration_rate": round(float(explore_mean[i]), 4),
+            "exploration_ci95": round(float(explore_ci[i]), 4),
+        }
+        for j, k in enumerate(ks):
+            sel = to_k[mask, j]
+            row[f"steps_to_{k}"] = round(float(np.nanmean(sel)), 1) if hits[j] else None
+            row[f"reached_{k}"] = round(float(hits[j] / episodes[i]), 3)
+        summary.append(row)
+    return sorted(summary, key=lambda r: -r["score_mean"])
+
+
+def format_table(summary: List[Dict], ks: Sequence[int]) -> str:
+    headers = ["config", "n", "steps", "score", "±95%", "explore"]
+    for k in ks:
+        headers += [f"→{k}", f"hit{k}"]
+    rows = []
+    for r in summary:
+        row = [r["config"], r["episodes"], r["mean_steps"], r["score_mean"],
+               r["score_ci95"], r["exploration_rate"]]
+        for k in ks:
+            row += ["-" if r[f"steps_to_{k}"] is None else r[f"steps_to_{k}"], r[f"reached_{k}"]]
+        rows.append([str(v) for v in row])
+    widths = [max(len(h), *(len(row[i]) for row in rows)) if rows else len(h)
+              for i, h in enumerate(headers)]
+    lines = ["  ".join(h.ljust(w) for h, w in zip(headers, widths)),
+             "  ".join("-" * w for w in widths)]
+    lines += ["  ".join(v.ljust(w) for v, w in zip(row, widths)) for row in rows]
+    return "\n".join(lines)
+
+
+def write_csv(summary: List[Dict], path: str) -> None:
+    import csv
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(summary[0]) if summary else ["config"])
+        writer.writeheader()
+        writer.writerows(summary)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Aggregate statistics over many trajectory logs")
+    parser.add_argument("root", help="Directory containing trajectory log directories")
+    parser.add_argument("--k", type=int, nargs="+", default=[10, 25, 50],
+                        help="Score thresholds for steps-to-score-k")
+    parser.add_argument("--workers", type=int, default=None, help="Reader processes")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not write the cache")
+    parser.add_argument("--csv", help="Also write the summary table as CSV")
+    parser.add_argument("--json", help="Also write the summary as JSON")
+    args = parser.parse_args()
+
+    cols = load_rows(args.root, args.k, workers=args.workers, use_cache=not args.no_cache)
+    summary = aggregate(cols, args.k)
+    if not summary:
+        print(f"[Aggregate] No trajectory logs under {args.root}")
+        return
+    print(format_table(summary, args.k))
+    if args.csv:
+        write_csv(summary, args.csv)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 # evaluator/post_run.py
-from typing import List, Dict, Any
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 
 def _unique_rooms(transcript: List[str]) -> int:
@@ -16,7 +17,80 @@ def _unique_verbs(transcript: List[str]) -> int:
     return len(verbs)
 
 
-def evaluate_run(env, transcript: List[str], done: bool = False) -> Dict[str, Any]:
+class RunMetrics:
+    """
+    Streaming accumulator for the evaluate_run() metrics, updated once per
+    env step so the final report needs no pass over the transcript and the
+    numbers can be read live (snapshot()) at any point of the run.
+
+    Tracks: score curve (only the steps where the score changed), distinct
+    rooms (first observation line) and verbs, loop rate (share of steps
+    repeating an earlier (room, action) pair), reward total, moves per
+    point and, given `llm_seconds`, the share of wall time spent in LLM calls.
+    """
+    def __init__(self, initial_obs: str = "", llm_seconds: Optional[Callable[[], float]] = None):
+        self.steps = 0
+        self.score = 0
+        self.moves = 0
+        self.total_reward = 0.0
+        self.loop_steps = 0
+        self.score_curve: List[Tuple[int, int]] = []
+        self.last_obs = initial_obs
+        self.llm_seconds = llm_seconds
+        self.started = time.perf_counter()
+        self._rooms = set()
+        self._verbs = set()
+        self._pairs = set()
+        if initial_obs:
+            self._rooms.add(_first_line(initial_obs))
+
+    def update(self, step, reward: float = 0, moves: Optional[int] = None) -> None:
+        """Fold in one engine Step (action, obs, score) and its reward."""
+        self.steps += 1
+        self.total_reward += reward
+        self.moves = moves if moves is not None else self.steps
+        if step.score != self.score:
+            self.score = step.score
+            self.score_curve.append((self.steps, step.score))
+        room = _first_line(step.obs)
+        self._rooms.add(room)
+        words = step.action.split()
+        if words:
+            self._verbs.add(words[0].lower())
+        pair = (room, step.action)
+        if pair in self._pairs:
+            self.loop_steps += 1
+        else:
+            self._pairs.add(pair)
+        self.last_obs = step.obs
+
+    def snapshot(self) -> Dict[str, Any]:
+        wall = time.perf_counter() - self.started
+        llm = self.llm_seconds() if self.llm_seconds else None
+        return {
+            "steps": self.steps,
+            "score": self.score,
+            "moves": self.moves,
+            "unique_rooms": len(self._rooms),
+            "unique_verbs": len(self._verbs),
+            "loop_rate": round(self.loop_steps / self.steps, 3) if self.steps else 0.0,
+            "total_reward": self.total_reward,
+            "moves_per_point": round(self.moves / self.score, 2) if self.score > 0 else None,
+            "llm_time_share": round(llm / wall, 3) if llm is not None and wall > 0 else None,
+            "score_curve": list(self.score_curve),
+        }
+
+
+def _first_line(obs: str) -> str:
+    return obs.split("\n", 1)[0]
+
+
+def evaluate_run(
+    env,
+    transcript: Optional[List[str]] = None,
+    done: bool = False,
+    metrics: Optional[RunMetrics] = None
+) -> Dict[str, Any]:
     """
     Post-hoc analysis of an episode.
 
@@ -25,6 +99,8 @@ def evaluate_run(env, transcript: List[str], done: bool = False) -> Dict[str, An
     env : jericho.FrotzEnv
     transcript : List[str]   Full text log (we assume you already prepended obs & actions)
     done : bool              Whether the game reached a terminal state
+    metrics : RunMetrics     Streaming accumulator; when given, the report is
+                             read from it and `transcript` is not scanned
 
     Returns
     -------
@@ -40,10 +116,27 @@ def evaluate_run(env, transcript: List[str], done: bool = False) -> Dict[str, An
         "score_pct": round(score / max_score, 3) if max_score else None,
         "moves": moves,
         "game_done": done,
-        "steps_in_loop": len(transcript),
-        "unique_rooms": _unique_rooms(transcript),
-        "unique_verbs": _unique_verbs(transcript),
-        "last_obs": transcript[-1] if transcript else None,
     }
 
-    return summary
\ No newline at end of file
+    if metrics is not None:
+        live = metrics.snapshot()
+        summary.update(
+            steps_in_loop=live["steps"],
+            unique_rooms=live["unique_rooms"],
+            unique_verbs=live["unique_verbs"],
+            last_obs=metrics.last_obs,
+            loop_rate=live["loop_rate"],
+            moves_per_point=live["moves_per_point"],
+            llm_time_share=live["llm_time_share"],
+            score_curve=live["score_curve"],
+        )
+        return summary
+
+    transcript = transcript or []
+    summary.update(
+        steps_in_loop=len(transcript),
+        unique_rooms=_unique_rooms(transcript),
+        unique_verbs=_unique_verbs(transcript),
+        last_obs=transcript[-1] if transcript else None,
+    )
+    return summary
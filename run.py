@@ -1,59 +1,365 @@
 #!/usr/bin/env python
+from __future__ import annotations
+
 import argparse
-import importlib
-from typing import List, Tuple
+import json
+import logging
+import multiprocessing as mp
+import os
+import random
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
 
 from omegaconf import OmegaConf
-from utils.ollama import OllamaClient
-from evaluator.post_run import evaluate_run
-from engine.core import ZorkinatorEngine
-from langchain_core.runnables import RunnableConfig
 
+# Heavy modules (jericho, langgraph, requests, NumPy) are imported inside
+# the functions that need them, so each CLI path only pays for its own.
+if TYPE_CHECKING:
+    from engine.core import ZorkinatorEngine
+    from engine.instrumentation import Instrumentation
+    from utils.ollama import OllamaClient
+
+ROLES = ("reasoner", "evaluator", "reflector")
+
+
+def component_options(cfg, role: str) -> Dict[str, Any]:
+    """Constructor options for a role: `<role>_options` plus its prompt budget."""
+    from engine import registry
+
+    options = cfg.get(f"{role}_options")
+    options = OmegaConf.to_container(options, resolve=True) if options else {}
+    budget = (cfg.get("prompt_budgets") or {}).get(role)
+    if budget and "max_prompt_tokens" in registry.signature_params(role, cfg[role]):
+        options.setdefault("max_prompt_tokens", int(budget))
+    return options
+
+
+def validate_components(cfg) -> None:
+    """Resolve every configured component and check its options up front."""
+    from engine import registry
+
+    for role in ROLES:
+        registry.validate(role, cfg[role], component_options(cfg, role))
+
+
+def build_metrics(cfg) -> Instrumentation:
+    """Instrumentation configured from the `metrics_*` / `profile_*` keys."""
+    from engine.instrumentation import Instrumentation
+
+    return Instrumentation(
+        export_path=cfg.get("metrics_path"),
+        export_every=cfg.get("metrics_every") or 100,
+        export_format=cfg.get("metrics_format") or "jsonl",
+        profile_steps=cfg.get("profile_steps") or 0,
+        profile_path=cfg.get("profile_path") or "profile.out"
+    )
 
-def instantiate_class(path: str, *args, **kwargs):
+
+def build_client(cfg, concurrency_limit=None, metrics: Instrumentation | None = None) -> OllamaClient:
     """
-    Dynamically import and instantiate a class by its full module path.
-    Falls back to no-argument constructor on TypeError.
+    Create the Ollama client described by the config, with the optional
+    prompt cache (`llm_cache_path`) and generation options.
     """
-    module_path, cls_name = path.rsplit(".", 1)
-    module = importlib.import_module(module_path)
-    cls = getattr(module, cls_name)
-    try:
-        return cls(*args, **kwargs)
-    except TypeError:
-        return cls()
+    from utils.cache import PromptCache
+    from utils.ollama import OllamaClient
+
+    cache = None
+    if cfg.get("llm_cache_size") or cfg.get("llm_cache_path"):
+        cache = PromptCache(
+            path=cfg.get("llm_cache_path"),
+            max_memory=cfg.get("llm_cache_size") or 4096,
+            max_disk=cfg.get("llm_cache_disk_size") or 200_000
+        )
+    options = cfg.get("ollama_options")
+    return OllamaClient(
+        model=cfg.get("ollama_model"),
+        base_url=cfg.get("ollama_base_url"),
+        concurrency_limit=concurrency_limit,
+        options=OmegaConf.to_container(options) if options is not None else None,
+        cache=cache,
+        metrics=metrics
+    )
+
+
+def role_client(cfg, client: OllamaClient, role: str):
+    """
+    The client a role's component talks to: a CascadeClient over
+    `cascade_models[role]` (smallest first), a client for
+    `component_models[role]`, or the shared `client`. Per-role clients share
+    the shared client's session, concurrency limit, cache and metrics.
+    """
+    cascade = (cfg.get("cascade_models") or {}).get(role)
+    model = (cfg.get("component_models") or {}).get(role)
+    if not (cascade or model):
+        return client
+    if not hasattr(client, "with_model"):
+        # e.g. the batch-mode shared client proxy, which serves one model
+        print(f"[Runner] {role}: per-component models need a direct client; using {client.model}")
+        return client
+    if cascade:
+        from utils.cascade import CascadeClient
+        return CascadeClient([client.with_model(m) for m in cascade], metrics=client.metrics)
+    return client.with_model(model)
+
+
+def build_engine(
+    cfg,
+    client: OllamaClient,
+    seed: int | None = None,
+    watch_stdin: bool = True,
+    metrics: Instrumentation | None = None,
+    trajectory_dir: str | None = None,
+    checkpoint_dir: str | None = None,
+    memory_spill_path: str | None = None,
+    resume: bool = False
+) -> ZorkinatorEngine:
+    """
+    Instantiate the configured reasoner/evaluator/reflector and wrap them
+    in a ZorkinatorEngine. With `resume` an existing trajectory log is
+    continued rather than overwritten (a checkpoint is about to be restored).
+    """
+    from engine import registry
+    from engine.checkpoint import Checkpointer
+    from engine.core import ZorkinatorEngine
+
+    checkpointer = None
+    checkpoint_dir = checkpoint_dir or cfg.get("checkpoint_dir")
+    if checkpoint_dir:
+        checkpointer = Checkpointer(
+            checkpoint_dir,
+            every=cfg.get("checkpoint_every") or 1000,
+            keep=cfg.get("checkpoint_keep") or 3
+        )
+
+    components = []
+    for role in ROLES:
+        component_client = role_client(cfg, client, role)
+        component = registry.create(role, cfg[role], component_client, component_options(cfg, role))
+        if hasattr(component_client, "escalations"):
+            # escalate when the component cannot use the small model's answer
+            component_client.accept = getattr(component, "accept_response", None)
+        components.append(component)
+    reasoner, evaluator, reflector = components
+    loop_breaker = None
+    if cfg.get("loop_breaker"):
+        from engine.loops import CycleBreaker
+        loop_breaker = CycleBreaker()
+
+    return ZorkinatorEngine(
+        game_path=cfg.game_file,
+        reasoner=reasoner,
+        evaluator=evaluator,
+        reflector=reflector,
+        seed=seed,
+        watch_stdin=watch_stdin,
+        memory_window=cfg.get("memory_window", 200),
+        memory_spill_path=memory_spill_path or cfg.get("memory_spill_path"),
+        seen_window=cfg.get("seen_window", 1000),
+        topology=cfg.get("topology", "serial"),
+        engine_mode=cfg.get("engine_mode", "graph"),
+        plan_boundary_only=bool(cfg.get("plan_boundary_only")),
+        loop_breaker=loop_breaker,
+        metrics=metrics,
+        checkpointer=checkpointer,
+        trajectory_dir=trajectory_dir or cfg.get("trajectory_dir"),
+        run_config=OmegaConf.to_container(cfg, resolve=True),
+        resume=resume
+    )
 
 
 def run_episode(
     engine: ZorkinatorEngine,
     max_steps: int | None
-) -> Tuple[List[str], bool]:
-    transcript = [engine.initial_state["obs"]]
-    cfg = RunnableConfig(recursion_limit=1_000_000)
+) -> bool:
+    """
+    Stream the engine graph until the game ends or `max_steps` graph steps
+    have run in total (an engine resumed from a checkpoint continues the
+    checkpointed count). Per-step metrics accumulate in `engine.run_metrics`;
+    returns whether the game reached a terminal state.
+    """
+    cfg = {"recursion_limit": 1_000_000}
     state = engine.initial_state
-    steps, done = 0, False
+    done = False
 
     for state in engine.graph.stream(state, cfg, stream_mode="values"):
-        transcript.append(state["obs"])
-        steps += 1
+        engine.graph_steps += 1
 
         if state.get("done"):
             done = True
             break
-        if max_steps and steps >= max_steps:
+        if max_steps and engine.graph_steps >= max_steps:
             print(f"\n[Runner] Step limit {max_steps} reached; ending.")
             break
 
-    return transcript, done
+    return done
+
+
+def run_replay(cfg, log_dir: str) -> None:
+    """
+    Re-execute a trajectory log against FrotzEnv without model calls and
+    re-score it with the configured evaluator (LLM-backed ones are skipped).
+    """
+    from engine import registry
+    from engine.trajlog import TrajectoryLog, replay
+    from evaluator.post_run import evaluate_run
+
+    log = TrajectoryLog(log_dir)
+    evaluator = None
+    if not cfg.evaluator.startswith("LLM"):
+        evaluator = registry.create("evaluator", cfg.evaluator, options=component_options(cfg, "evaluator"))
+    result = replay(log, evaluator=evaluator)
+    report = evaluate_run(result["env"], done=bool(len(log) and log.steps[-1]["done"]),
+                          metrics=result["metrics"])
+    print(f"[Replay] {len(log)} steps from {log_dir}, {result['mismatches']} observation mismatches")
+    if evaluator is not None:
+        print(f"[Replay] {cfg.evaluator} total reward: {sum(result['rewards'])}")
+    for k, v in report.items():
+        print(f"{k}: {v}")
 
 
-def run_single_action(engine: ZorkinatorEngine, action: str) -> None:
-    obs, _ = engine.env.reset()
+def run_single_action(cfg, action: str) -> None:
+    """One env step on a fresh game; no components, client or graph."""
+    from jericho import FrotzEnv
+
+    seed = cfg.get("seed")
+    env = FrotzEnv(cfg.game_file) if seed is None else FrotzEnv(cfg.game_file, seed=seed)
+    obs, _ = env.reset()
     print("[Env Start]", obs)
-    obs, *_ = engine.env.step(action)
+    obs, *_ = env.step(action)
     print("[Env Response]", obs.strip())
 
 
+# ──────────────────────────────────────────────────────────────────────
+# Batch mode: one engine + FrotzEnv per worker process
+# ──────────────────────────────────────────────────────────────────────
+_LLM_CONCURRENCY = None
+_LLM_SERVER = None
+
+
+def episode_path(path: str, episode: int) -> str:
+    """`runs/spill.txt` -> `runs/spill.episode-00003.txt`."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.episode-{episode:05d}{ext}"
+
+
+def _init_worker(concurrency_limit, server) -> None:
+    global _LLM_CONCURRENCY, _LLM_SERVER
+    _LLM_CONCURRENCY = concurrency_limit
+    _LLM_SERVER = server
+
+
+def episode_seeds(base: int | None, episodes: int) -> List[int]:
+    """
+    Seeds for a batch: base, base + 1, ... (1, 2, ... without a base),
+    skipping 0, which Jericho reads as "use the game's default seed".
+    """
+    seeds, seed = [], 1 if base is None else base
+    while len(seeds) < episodes:
+        if seed != 0:
+            seeds.append(seed)
+        seed += 1
+    return seeds
+
+
+def _run_batch_episode(job: Tuple[Dict[str, Any], int, int]) -> Dict[str, Any]:
+    """
+    Worker entry point: build a fresh engine for one seed, play it out and
+    return the post-run report tagged with the episode metadata.
+    """
+    from engine.instrumentation import Instrumentation
+    from evaluator.post_run import evaluate_run
+    from utils.batching import connect_shared_client
+
+    cfg_dict, episode, seed = job
+    cfg = OmegaConf.create(cfg_dict)
+    if (cfg.get("reasoner_options") or {}).get("episodic_path"):
+        # EpisodicMemory files take a single writer
+        cfg.reasoner_options.episodic_path = episode_path(cfg.reasoner_options.episodic_path, episode)
+    random.seed(seed)
+
+    metrics = Instrumentation()  # per episode, so llm_time_share is this episode's
+    if _LLM_SERVER is not None:
+        client = connect_shared_client(*_LLM_SERVER)
+    else:
+        client = build_client(cfg, concurrency_limit=_LLM_CONCURRENCY, metrics=metrics)
+    # per-episode output paths, so workers never share files
+    trajectory_dir = checkpoint_dir = memory_spill_path = None
+    if cfg.get("trajectory_dir"):
+        trajectory_dir = os.path.join(cfg.trajectory_dir, f"episode-{episode:05d}")
+    if cfg.get("checkpoint_dir"):
+        checkpoint_dir = os.path.join(cfg.checkpoint_dir, f"episode-{episode:05d}")
+    if cfg.get("memory_spill_path"):
+        memory_spill_path = episode_path(cfg.memory_spill_path, episode)
+    engine = build_engine(cfg, client, seed=seed, watch_stdin=False, metrics=metrics,
+                          trajectory_dir=trajectory_dir, checkpoint_dir=checkpoint_dir,
+                          memory_spill_path=memory_spill_path)
+    if _LLM_SERVER is not None:
+        # calls are timed in the serving process, shared by every episode
+        engine.run_metrics.llm_seconds = None
+    done = run_episode(engine, cfg.get("episode_max_steps"))
+
+    if engine.trajectory is not None:
+        engine.trajectory.close()
+    if getattr(engine.reasoner, "episodic", None) is not None:
+        engine.reasoner.episodic.flush()
+    report = evaluate_run(engine.env, done=done, metrics=engine.run_metrics)
+    report.update(
+        episode=episode,
+        seed=seed,
+        reasoner=cfg.reasoner,
+        evaluator=cfg.evaluator,
+        reflector=cfg.reflector,
+    )
+    return report
+
+
+def run_batch(cfg, episodes: int, workers: int, results_path: str) -> None:
+    """
+    Run `episodes` independent episodes over a pool of `workers` processes.
+    Reports are appended to `results_path` (JSON lines) as soon as each
+    episode finishes. All workers share one semaphore capping in-flight
+    LLM requests at `llm_max_concurrency`.
+
+    With `llm_batch_window_ms` set, workers instead send their prompts to a
+    single BatchingClient in this process, which coalesces requests from
+    all episodes (again at most `llm_max_concurrency` in flight).
+    """
+    cfg_dict = OmegaConf.to_container(cfg, resolve=True)
+    seeds = episode_seeds(cfg.get("seed"), episodes)
+    jobs = [(cfg_dict, i, seed) for i, seed in enumerate(seeds)]
+
+    ctx = mp.get_context("spawn")
+    max_concurrency = cfg.get("llm_max_concurrency") or workers
+    concurrency_limit = ctx.BoundedSemaphore(max_concurrency)
+
+    server, batcher = None, None
+    if cfg.get("llm_batch_window_ms"):
+        from utils.batching import BatchingClient, serve_shared_client
+        batcher = BatchingClient(
+            build_client(cfg),
+            window_ms=cfg.llm_batch_window_ms,
+            max_batch=max_concurrency,
+            dedupe=cfg.get("llm_batch_dedupe")
+        )
+        server = serve_shared_client(batcher)
+
+    print(f"🚀 Zorkinator batch: {episodes} episodes on {workers} workers -> {results_path}")
+    scores = []
+    with open(results_path, "a") as out, ctx.Pool(
+        workers, initializer=_init_worker, initargs=(concurrency_limit, server)
+    ) as pool:
+        for report in pool.imap_unordered(_run_batch_episode, jobs):
+            out.write(json.dumps(report) + "\n")
+            out.flush()
+            scores.append(report["final_score"])
+            print(f"[Batch] episode {report['episode']} (seed {report['seed']}): "
+                  f"score={report['final_score']} moves={report['moves']}")
+
+    if scores:
+        print(f"\n[Batch] {len(scores)} episodes, mean score {sum(scores) / len(scores):.2f}")
+    if batcher is not None:
+        print(f"[Batch] LLM batching: {batcher.stats()}")
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Run the Zorkinator agent with YAML+--opts config"
@@ -72,6 +378,29 @@ def main() -> None:
         "--action",
         help="Run one action and exit"
     )
+    parser.add_argument(
+        "--resume",
+        help="Continue from a checkpoint file (or the newest one in a directory)"
+    )
+    parser.add_argument(
+        "--replay",
+        help="Re-execute a trajectory log directory against the game (no LLM calls)"
+    )
+    parser.add_argument(
+        "--episodes",
+        type=int,
+        help="Run N episodes in batch mode (one seed per episode)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker processes for batch mode (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--results",
+        default="results.jsonl",
+        help="JSON-lines file that batch mode appends reports to"
+    )
     args = parser.parse_args()
 
     # 1) Load base YAML config
@@ -81,45 +410,73 @@ def main() -> None:
     if args.opts:
         override_conf = OmegaConf.from_dotlist(args.opts)
         cfg = OmegaConf.merge(cfg, override_conf)
+    logging.basicConfig(level=cfg.get("log_level") or "INFO", format="[%(name)s] %(message)s")
 
-    # 3) Instantiate shared Ollama client
-    client = OllamaClient(
-        model=cfg.get("ollama_model"),
-        base_url=cfg.get("ollama_base_url")
-    )
+    # 3) Single-action shortcut: just the game, no components or graph
+    if args.action:
+        run_single_action(cfg, args.action)
+        return
+    validate_components(cfg)
 
-    # 4) Dynamically build components
-    reasoner_path   = f"engine.components.reasoners.{cfg.reasoner}"
-    evaluator_path  = f"engine.components.evaluators.{cfg.evaluator}"
-    reflector_path  = f"engine.components.reflectors.{cfg.reflector}"
+    # 3a) Replay a recorded trajectory without any model
+    if args.replay:
+        run_replay(cfg, args.replay)
+        return
 
-    reasoner  = instantiate_class(reasoner_path, client)
-    evaluator = instantiate_class(evaluator_path, client)
-    reflector = instantiate_class(reflector_path, client)
+    # 3b) Batch mode: every worker builds its own client and engine
+    if args.episodes:
+        workers = args.workers or min(args.episodes, os.cpu_count() or 1)
+        run_batch(cfg, args.episodes, workers, args.results)
+        return
 
-    # 5) Create the engine
-    engine = ZorkinatorEngine(
-        game_path=cfg.game_file,
-        reasoner=reasoner,
-        evaluator=evaluator,
-        reflector=reflector
-    )
+    # 4) Instantiate shared Ollama client and instrumentation
+    metrics = build_metrics(cfg)
+    client = build_client(cfg, metrics=metrics)
 
-    # 6) Single-action shortcut
-    if args.action:
-        run_single_action(engine, args.action)
-        return
+    # 5) Dynamically build components and create the engine
+    engine = build_engine(cfg, client, seed=cfg.get("seed"), metrics=metrics, resume=bool(args.resume))
 
-    # 7) Full episode run
+    # 6) Full episode run, optionally continuing from a checkpoint
+    if args.resume:
+        from engine.checkpoint import load_checkpoint
+        payload = load_checkpoint(args.resume)
+        engine.restore(payload)
+        print(f"[Runner] Resumed from {args.resume} at env step {payload['env_steps']}")
     print("🚀 Zorkinator modular engine started")
     cap = cfg.get("episode_max_steps")
-    transcript, done = run_episode(engine, cap)
+    done = run_episode(engine, cap)
 
-    # 8) Post-run evaluation
-    report = evaluate_run(engine.env, transcript, done=done)
+    # 7) Post-run evaluation
+    from evaluator.post_run import evaluate_run
+    if engine.trajectory is not None:
+        engine.trajectory.close()
+    if getattr(engine.reasoner, "episodic", None) is not None:
+        engine.reasoner.episodic.flush()
+    report = evaluate_run(engine.env, done=done, metrics=engine.run_metrics)
     print("\n🧠 Final Evaluation Report")
     for k, v in report.items():
         print(f"{k}: {v}")
+    print(f"llm_calls: {client.stats()}")
+    metrics.export()
+    if hasattr(engine.reasoner, "world"):
+        print(f"rooms_mapped: {len(engine.reasoner.world.room_names)}, "
+              f"autopilot_moves: {engine.reasoner.autopilot_moves}")
+    if hasattr(engine.reasoner, "valid_actions"):
+        print(f"valid_actions: {engine.reasoner.valid_actions.stats()}")
+    if hasattr(engine.reasoner, "archive"):
+        print(f"exploration: {engine.reasoner.stats()}")
+    if hasattr(engine.reasoner, "plan_boundary"):
+        print(f"planning: {engine.reasoner.stats()}")
+    if hasattr(engine.reasoner, "parser"):
+        print(f"action_parser: {engine.reasoner.parser.stats()}")
+    for role in ROLES:
+        component_client = getattr(getattr(engine, role), "client", None)
+        if hasattr(component_client, "escalations"):
+            print(f"cascade_{role}: {component_client.stats()}")
+        elif component_client is not None and component_client is not client:
+            print(f"llm_calls_{role}: {component_client.stats()}")
+    if client.cache is not None:
+        print(f"llm_cache: {client.cache.stats()}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,79 @@
+import pytest
+
+from engine.action_parser import ActionParser, clean
+
+VALID = ["north", "open mailbox", "take leaflet", "take lamp"]
+
+
+class DictionaryEnv:
+    """Just enough of FrotzEnv: a world hash and a Z-machine dictionary (6-letter words)."""
+    def __init__(self, words=("open", "mailbo", "take", "leafle", "read", "lamp", "north", "look")):
+        self.words = words
+
+    def get_world_state_hash(self):
+        return "west-of-house"
+
+    def get_dictionary(self):
+        if self.words is None:
+            raise RuntimeError("no dictionary")
+        return list(self.words)
+
+
+@pytest.mark.parametrize("reply, command", [
+    ("Next command: open the mailbox.", "open the mailbox"),
+    ("> North!", "north"),
+    ("1. take lamp", "take lamp"),
+    ("I will read the leaflet", "read the leaflet"),
+    ("I'll open mailbox", "open mailbox"),
+    ("I’ll go north", "go north"),
+    ("Let’s take “lamp”", "take lamp"),
+    ("**look**\nbecause it is dark", "look"),
+    ("Illuminate lamp", "illuminate lamp"),
+    ("   ", ""),
+])
+def test_clean(reply, command):
+    assert clean(reply) == command
+
+
+def test_resolve_against_valid_actions():
+    parser, env = ActionParser(), DictionaryEnv()
+    assert parser.resolve("Open Mailbox", env, VALID) == ("open mailbox", "exact")
+    assert parser.resolve("go n", env, VALID) == ("north", "exact")
+    assert parser.resolve("take the leaflet carefully", env, VALID) == ("take leaflet", "prefix")
+    assert parser.resolve("take lamb", env, VALID) == ("take lamp", "fuzzy")
+
+
+def test_fuzzy_match_keeps_the_verb():
+    parser = ActionParser()
+    # "read leaflet" is close to "take leaflet" but must not become it
+    assert parser.resolve("read leaflet", None, VALID) == (None, "unmatched")
+    assert parser.resolve("read leaflet", DictionaryEnv(), VALID) == ("read leaflet", "vocabulary")
+
+
+def test_vocabulary_fallback():
+    parser = ActionParser()
+    assert parser.resolve("opne mailbox", DictionaryEnv(), VALID) == ("open mailbox", "corrected")
+    assert parser.resolve("xyzzy plugh", DictionaryEnv(), VALID) == (None, "unmatched")
+    # without a dictionary nothing vouches for a command outside the valid actions
+    assert ActionParser().resolve("read leaflet", DictionaryEnv(None), VALID) == (None, "unmatched")
+    assert ActionParser().resolve("read leaflet", DictionaryEnv(None)) == ("read leaflet", "unchecked")
+
+
+def test_confident_rejects_guesses():
+    parser, env = ActionParser(), DictionaryEnv()
+    assert parser.confident("I'll take lamp", env, VALID)
+    assert not parser.confident("take lamb", env, VALID)
+    assert not parser.confident("opne mailbox", env, VALID)
+
+
+def test_snap_reprompts_once():
+    parser, env, prompts = ActionParser(), DictionaryEnv(), []
+
+    def reprompt(bad):
+        prompts.append(bad)
+        return "take lamp"
+
+    assert parser.snap("xyzzy plugh", env, VALID, reprompt) == "take lamp"
+    assert prompts == ["xyzzy plugh"]
+    assert parser.snap("frobozz", env, VALID, lambda bad: "still nonsense") == "still nonsense"
+    assert parser.stats() == {"reprompts": 2, "exact": 1, "failures": 1}
@@ -0,0 +1,42 @@
+from collections import Counter
+from types import SimpleNamespace
+
+from engine.checkpoint import Checkpointer, component_state, load_checkpoint, restore_component
+from engine.components.evaluators import ScoreDeltaEvaluator
+from engine.components.reasoners import LookaheadReasoner
+
+
+def test_component_state_leaves_out_bound_parts():
+    evaluator = ScoreDeltaEvaluator()
+    reasoner = LookaheadReasoner()
+    reasoner.bind_evaluator(evaluator)
+    state = component_state(reasoner)
+    assert "evaluator" not in state and "trajectory" not in state
+
+    restore_component(reasoner, state)
+    assert reasoner.evaluator is evaluator
+
+
+def test_save_and_load_round_trip(tmp_path):
+    engine = SimpleNamespace(
+        env=SimpleNamespace(get_state=lambda: ("room", 7)),
+        metrics=SimpleNamespace(counters=Counter(env_steps=12)),
+        trajectory=None,
+        transcript=["> look"],
+        reasoner=LookaheadReasoner(),
+        evaluator=ScoreDeltaEvaluator(),
+        reflector=SimpleNamespace(),
+        loop_breaker=None,
+        run_metrics=SimpleNamespace(steps=12),
+        graph_steps=40,
+    )
+    checkpointer = Checkpointer(str(tmp_path), every=5, keep=2)
+    for step in (12, 17, 22):
+        engine.metrics.counters["env_steps"] = step
+        checkpointer.save(engine, {"obs": "West of House"})
+
+    assert len(list(tmp_path.glob("ckpt-*.pkl.gz"))) == 2
+    payload = load_checkpoint(str(tmp_path))
+    assert payload["env_steps"] == 22 and payload["graph_steps"] == 40
+    assert payload["env_state"] == ("room", 7)
+    assert "evaluator" not in payload["reasoner"]
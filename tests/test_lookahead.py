@@ -0,0 +1,44 @@
+from engine.components.evaluators import ScoreDeltaEvaluator
+from engine.components.reasoners import LookaheadReasoner
+
+
+class CorridorEnv:
+    """Two rooms joined east/west; the world hash leaves out the move counter."""
+    def __init__(self):
+        self.room, self.moves, self.score = 0, 0, 0
+
+    def get_state(self):
+        return (self.room, self.moves, self.score)
+
+    def set_state(self, state):
+        self.room, self.moves, self.score = state
+
+    def get_world_state_hash(self):
+        return f"room-{self.room}"
+
+    def get_valid_actions(self, use_ctypes=True, use_parallel=True):
+        return ["east", "west", "wait"]
+
+    def get_score(self):
+        return self.score
+
+    def get_moves(self):
+        return self.moves
+
+    def step(self, action):
+        self.moves += 1
+        self.room = {"east": 1, "west": 0}.get(action, self.room)
+        return f"Room {self.room}", 0, False, {"score": self.score, "moves": self.moves}
+
+
+def test_choose_action_leaves_the_env_untouched():
+    env = CorridorEnv()
+    reasoner = LookaheadReasoner(depth=2, beam_width=2)
+    reasoner.bind_evaluator(ScoreDeltaEvaluator())
+    for move in ["east", "west"] * 3:
+        env.step(move)
+        # back in an already-seen room: same world hash, later move counter
+        before = env.get_state()
+        reasoner.choose_action({"obs": f"Room {env.room}"}, env)
+        assert env.get_state() == before
+    assert env.get_moves() == 6
@@ -0,0 +1,41 @@
+import random
+
+from engine.loops import CycleDetector
+
+
+def brute_force_period(seq, window, min_repeats):
+    """Shortest p <= window // 2 whose last min_repeats * p symbols are p-periodic."""
+    n = len(seq)
+    for p in range(1, window // 2 + 1):
+        span = min_repeats * p
+        if span > n:
+            break
+        if all(seq[i] == seq[i - p] for i in range(n - span + p, n)):
+            return p
+    return 0
+
+
+def test_repeated_symbol_inside_period():
+    detector = CycleDetector(window=64)
+    periods = [detector.push(obs, "go") for obs in "ABCACB" * 100]
+    assert periods[11:] == [6] * (len(periods) - 11)
+    assert not any(periods[:11])
+
+
+def test_matches_brute_force_on_random_trajectories():
+    rng = random.Random(0)
+    for trial in range(60):
+        window = rng.choice([8, 16, 32])
+        min_repeats = rng.choice([2, 3])
+        detector = CycleDetector(window=window, min_repeats=min_repeats)
+        seq = []
+        while len(seq) < 300:
+            # mix random noise with repeated blocks of random periods
+            if rng.random() < 0.5:
+                seq.append(rng.randrange(4))
+            else:
+                block = [rng.randrange(4) for _ in range(rng.randint(1, window // 2))]
+                seq.extend(block * rng.randint(1, 4))
+        for t, sym in enumerate(seq[:300]):
+            expected = brute_force_period(seq[:t + 1], window, min_repeats)
+            assert detector.push(str(sym), "a") == expected, (trial, t)
@@ -0,0 +1,54 @@
+from engine.trajlog import TrajectoryLog, TrajectoryWriter, config_hash
+from engine.transcript import Step
+from evaluator.aggregate import config_label
+
+
+def _write(directory, actions, resume=False, config=None):
+    writer = TrajectoryWriter(str(directory), "zork1.z5", "West of House", config=config, resume=resume)
+    for action in actions:
+        n = writer.steps_written
+        writer.log(Step(n, action, f"Room {n % 2}", score=n), reward=1.0, moves=n + 1)
+    return writer
+
+
+def test_round_trip(tmp_path):
+    _write(tmp_path, ["north", "south", "north"]).close()
+    log = TrajectoryLog(str(tmp_path))
+    assert len(log) == 3 and log.initial_obs == "West of House"
+    assert log.actions() == ["north", "south", "north"]
+    assert log[2] == {"step": 2, "action": "north", "obs": "Room 0", "score": 2,
+                      "reward": 1.0, "moves": 3, "done": False}
+
+
+def test_resume_truncates_and_appends(tmp_path):
+    _write(tmp_path, ["north", "south", "east", "west"]).close()
+    writer = _write(tmp_path, [], resume=True)
+    assert writer.steps_written == 4
+    writer.truncate(2)   # a checkpoint taken after two steps
+    for action in ["up", "down"]:
+        n = writer.steps_written
+        writer.log(Step(n, action, "Attic", score=n))
+    writer.close()
+    log = TrajectoryLog(str(tmp_path))
+    assert log.actions() == ["north", "south", "up", "down"]
+    assert log.meta["steps"] == 4 and log[3]["obs"] == "Attic"
+
+
+def test_config_hash_ignores_seed_and_paths():
+    base = {"reasoner": "LLMReasoner", "ollama_model": "llama3", "seed": 1,
+            "trajectory_dir": "runs/a", "reasoner_options": {"episodic_path": "a.jsonl", "episodic_k": 3}}
+    other_episode = {**base, "seed": 2, "trajectory_dir": "runs/b",
+                     "reasoner_options": {"episodic_path": "b.jsonl", "episodic_k": 3}}
+    other_model = {**base, "ollama_model": "qwen2"}
+    assert config_hash(base) == config_hash(other_episode)
+    assert config_hash(base) != config_hash(other_model)
+
+
+def test_config_label_groups_on_the_hash(tmp_path):
+    run = {"reasoner": "LLMReasoner", "ollama_model": "llama3"}
+    config = {"reasoner": "LLMReasoner", "evaluator": "ScoreDeltaEvaluator",
+              "reflector": "NullReflector", "topology": "serial"}
+    _write(tmp_path, ["look"], config={**config, "run": run, "hash": config_hash(run)}).close()
+    label = config_label(TrajectoryLog(str(tmp_path)).meta)
+    assert label == f"LLMReasoner/ScoreDeltaEvaluator/NullReflector/serial#{config_hash(run)}"
+    assert config_label({"config": config}) == "LLMReasoner/ScoreDeltaEvaluator/NullReflector/serial"
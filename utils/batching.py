@@ -0,0 +1,129 @@
+# utils/batching.py
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.ollama import OllamaClient
+
+
+class BatchingClient:
+    """
+    Coalesces completion requests from many callers.
+
+    Requests arriving within `window_ms` of the first pending one (up to
+    `max_batch`) are dispatched together: they are issued concurrently so
+    the Ollama server can schedule them in one batch (see
+    OLLAMA_NUM_PARALLEL), and each answer is routed back to its caller.
+    Exposes the same `complete` as OllamaClient.
+
+    With `dedupe`, identical prompts in a batch are sent once and share the
+    answer. That is only sound for deterministic generation: with sampling
+    it would hand every episode of a seed sweep the same completion. The
+    default (None) dedupes only when the client's options fix the seed or
+    set temperature 0.
+    """
+    def __init__(self, client: OllamaClient, window_ms: float = 20.0, max_batch: int = 8,
+                 dedupe: Optional[bool] = None):
+        self.client = client
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        if dedupe is None:
+            options = getattr(client, "options", {})
+            dedupe = options.get("temperature") == 0 or options.get("seed") is not None
+        self.dedupe = dedupe
+        self.batches = 0
+        self.requests = 0
+        self.deduplicated = 0
+        self._queue: "queue.Queue[Tuple[str, bool, Future]]" = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max_batch, thread_name_prefix="llm-batch")
+        threading.Thread(target=self._dispatch_loop, daemon=True).start()
+
+    def complete(self, prompt: str, first_line: bool = False) -> str:
+        future: Future = Future()
+        self._queue.put((prompt, first_line, future))
+        return future.result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "deduplicated": self.deduplicated,
+            "mean_batch": round(self.requests / self.batches, 2) if self.batches else None,
+        }
+
+    def _collect(self) -> List[Tuple[str, bool, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            batch = self._collect()
+            groups: Dict[Tuple, List[Future]] = {}
+            for i, (prompt, first_line, future) in enumerate(batch):
+                key = (prompt, first_line) if self.dedupe else (prompt, first_line, i)
+                groups.setdefault(key, []).append(future)
+            self.batches += 1
+            self.requests += len(batch)
+            self.deduplicated += len(batch) - len(groups)
+
+            for (prompt, first_line, *_), futures in groups.items():
+                call = self._pool.submit(self.client.complete, prompt, first_line)
+                call.add_done_callback(lambda done, fs=futures: self._resolve(done, fs))
+
+    @staticmethod
+    def _resolve(done: Future, futures: List[Future]) -> None:
+        exc = done.exception()
+        for f in futures:
+            if exc is not None:
+                f.set_exception(exc)
+            else:
+                f.set_result(done.result())
+
+# ──────────────────────────────────────────────────────────────────────
+# Sharing one client across worker processes
+# ──────────────────────────────────────────────────────────────────────
+class _ClientServer(BaseManager):
+    pass
+
+
+class _ClientConnection(BaseManager):
+    pass
+
+
+_ClientConnection.register("llm")
+
+
+def serve_shared_client(client) -> Tuple[Tuple[str, int], bytes]:
+    """
+    Serve `client` from a background thread of this process; returns the
+    (address, authkey) that workers pass to connect_shared_client().
+    Every worker connection is handled on its own server thread, so calls
+    from different processes reach a BatchingClient concurrently.
+    """
+    authkey = os.urandom(16)
+    _ClientServer.register("llm", callable=lambda: client)
+    manager = _ClientServer(address=("127.0.0.1", 0), authkey=authkey)
+    server = manager.get_server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.address, authkey
+
+
+def connect_shared_client(address: Tuple[str, int], authkey: bytes):
+    """Return a proxy whose complete() runs in the serving process."""
+    manager = _ClientConnection(address=address, authkey=authkey)
+    manager.connect()
+    return manager.llm()
@@ -0,0 +1,109 @@
+# utils/cache.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def cache_key(model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """Content address of a completion request."""
+    blob = json.dumps([model, prompt, options or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class PromptCache:
+    """
+    Two-tier prompt → response cache.
+
+    - memory tier: an LRU of at most `max_memory` entries;
+    - disk tier (optional): a SQLite table at `path`, capped at `max_disk`
+      rows; when full, the least recently used 10% are evicted.
+
+    Safe to share between threads; several processes may point at the same
+    file (SQLite serializes the writers).
+    """
+    def __init__(self, path: Optional[str] = None, max_memory: int = 4096, max_disk: int = 200_000):
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lru: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                " key TEXT PRIMARY KEY, response TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON completions(last_used)")
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return self._lru[key]
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT response FROM completions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key)
+                    )
+                    self._db.commit()
+                    self._remember(key, row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: str) -> None:
+        with self._lock:
+            self._remember(key, response)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO completions (key, response, last_used) VALUES (?, ?, ?)",
+                    (key, response, time.time())
+                )
+                self._puts += 1
+                # COUNT(*) is a table scan; only check the bound periodically
+                if self._puts % 256 == 0:
+                    (count,) = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()
+                    if count > self.max_disk:
+                        self._db.execute(
+                            "DELETE FROM completions WHERE key IN ("
+                            " SELECT key FROM completions ORDER BY last_used LIMIT ?)",
+                            (count - self.max_disk + self.max_disk // 10,)
+                        )
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "memory_entries": len(self._lru),
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key: str, response: str) -> None:
+        self._lru[key] = response
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_memory:
+            self._lru.popitem(last=False)
@@ -0,0 +1,71 @@
+# utils/cascade.py
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class CascadeClient:
+    """
+    Tiered model routing behind the OllamaClient `complete` interface.
+
+    A request goes to the first (smallest, fastest) tier; its answer is
+    returned if `accept(answer)` holds, otherwise the request escalates to
+    the next tier. The last tier's answer is always returned. `accept` is
+    normally the owning component's `accept_response`, which checks that
+    the answer parses (an integer reward, a recognisable command, ...);
+    without one, only empty answers escalate.
+
+    Tracks calls and latency per tier and the escalation rate.
+    """
+    def __init__(self, tiers: List, accept: Optional[Callable[[str], bool]] = None, metrics=None):
+        if not tiers:
+            raise ValueError("CascadeClient needs at least one tier")
+        self.tiers = tiers
+        self.accept = accept
+        self.metrics = metrics
+        self.calls = 0
+        self.escalations = 0
+        self.tier_calls = [0] * len(tiers)
+        self.tier_latency = [0.0] * len(tiers)
+        self.tier_accepted = [0] * len(tiers)
+
+    @property
+    def model(self) -> str:
+        return "→".join(getattr(t, "model", "?") for t in self.tiers)
+
+    @property
+    def cache(self):
+        return getattr(self.tiers[0], "cache", None)
+
+    def complete(self, prompt: str, first_line: bool = False) -> str:
+        self.calls += 1
+        last = len(self.tiers) - 1
+        for i, tier in enumerate(self.tiers):
+            start = time.perf_counter()
+            response = tier.complete(prompt, first_line)
+            self.tier_calls[i] += 1
+            self.tier_latency[i] += time.perf_counter() - start
+            ok = self.accept(response) if self.accept is not None else bool(response.strip())
+            if ok or i == last:
+                if ok:
+                    self.tier_accepted[i] += 1
+                return response
+            self.escalations += 1
+            if self.metrics is not None:
+                self.metrics.incr("llm.escalations")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "escalations": self.escalations,
+            "escalation_rate": round(self.escalations / self.calls, 4) if self.calls else None,
+            "tiers": [
+                {
+                    "model": getattr(tier, "model", "?"),
+                    "calls": n,
+                    "accepted": self.tier_accepted[i],
+                    "mean_latency": round(self.tier_latency[i] / n, 4) if n else None,
+                }
+                for i, (tier, n) in enumerate(zip(self.tiers, self.tier_calls))
+            ],
+        }
@@ -1,25 +1,222 @@
 # utils/ollama.py
 
+import asyncio
+import copy
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from engine.prompts import estimate_tokens
+from utils.cache import PromptCache, cache_key
+
+# Prompts and responses are logged at DEBUG; enable with log_level: DEBUG.
+logger = logging.getLogger("zorkinator.llm")
+
+
+@dataclass
+class CallStats:
+    """Timing of one completion request."""
+    latency: float = 0.0          # seconds, request start → last byte used
+    ttft: float = 0.0             # seconds to the first streamed token
+    prompt_tokens: int = 0        # as reported by the server, else estimated
+    prompt_tokens_estimated: bool = False  # the stream was cut before the server's count
+    tokens: int = 0               # completion tokens received
+    tokens_per_sec: float = 0.0
+    truncated: bool = False       # generation cut short after the first line
+    cached: bool = False
+
 
 class OllamaClient:
-    def __init__(self, model: str, base_url: str = "http://localhost:11434"):
+    def __init__(
+        self,
+        model: str,
+        base_url: str = "http://localhost:11434",
+        concurrency_limit=None,
+        options: Optional[Dict[str, Any]] = None,
+        cache: Optional[PromptCache] = None,
+        pool_size: int = 4,
+        timeout: float = 300.0,
+        metrics=None
+    ):
+        """
+        concurrency_limit: optional semaphore-like object (acquire/release)
+        shared between clients to cap the number of concurrent requests to
+        the server (not the request rate), e.g. a multiprocessing
+        BoundedSemaphore handed to every batch worker.
+        options: Ollama generation options (temperature, seed, ...).
+        cache: optional PromptCache; identical (model, prompt, options)
+        requests are answered from it without contacting the server.
+        pool_size: keep-alive connections held by the HTTP session.
+        metrics: optional engine Instrumentation receiving per-call timings
+        and token counts.
+        """
         self.model = model
         self.base_url = base_url.rstrip("/")
+        self.concurrency_limit = concurrency_limit
+        self.options = dict(options) if options else {}
+        self.cache = cache
+        self.timeout = timeout
+        self.metrics = metrics
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.last_stats = CallStats()
+        self.calls = 0
+        self.total_latency = 0.0
+        self.total_ttft = 0.0
+        self.total_tokens = 0
+
+    def complete(self, prompt: str, first_line: bool = False) -> str:
+        """
+        Return the model's completion for `prompt`.
+
+        With first_line=True the response is streamed and the request is
+        closed as soon as a complete non-empty line has arrived; only that
+        line is returned. Callers that keep `splitlines()[0]` anyway should
+        use it to stop paying for the rest of the generation.
+        """
+        key = None
+        if self.cache is not None:
+            key = cache_key(self.model, prompt, {**self.options, "_first_line": first_line})
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.last_stats = CallStats(cached=True)
+                if self.metrics is not None:
+                    self.metrics.incr("llm.cache_hits")
+                return cached
 
-    def complete(self, prompt: str) -> str:
         payload = {
             "model": self.model,
             "prompt": prompt,
-            "stream": False,
+            "stream": first_line,
         }
+        if self.options:
+            payload["options"] = self.options
         try:
-            print(f"\n[OllamaClient] Prompt sent to model '{self.model}':\n{prompt}\n")
-            res = requests.post(f"{self.base_url}/api/generate", json=payload)
-            res.raise_for_status()
-            response = res.json()["response"].strip()
-            print(f"[OllamaClient] Response:\n{response}\n")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Prompt sent to model '%s':\n%s", self.model, prompt)
+            if self.concurrency_limit is not None:
+                self.concurrency_limit.acquire()
+            try:
+                if first_line:
+                    response, stats = self._generate_first_line(payload)
+                else:
+                    response, stats = self._generate(payload)
+            finally:
+                if self.concurrency_limit is not None:
+                    self.concurrency_limit.release()
+            self._record(stats)
+            logger.debug("Response:\n%s", response)
+            if key is not None:
+                self.cache.put(key, response)
             return response
         except Exception as e:
             print(f"[OllamaClient Error] {e}")
-            return "look"
\ No newline at end of file
+            if self.metrics is not None:
+                self.metrics.incr("llm.errors")
+            return "look"
+
+    def with_model(self, model: str) -> "OllamaClient":
+        """
+        Client for another model that shares this one's session,
+        concurrency limit, cache and metrics but keeps its own call
+        statistics.
+        """
+        clone = copy.copy(self)
+        clone.model = model
+        clone.last_stats = CallStats()
+        clone.calls = 0
+        clone.total_latency = 0.0
+        clone.total_ttft = 0.0
+        clone.total_tokens = 0
+        return clone
+
+    async def acomplete(self, prompt: str, first_line: bool = False) -> str:
+        """
+        Awaitable complete(). Runs the blocking request on the default
+        executor, so several coroutines share the session's connection pool.
+        """
+        return await asyncio.to_thread(self.complete, prompt, first_line)
+
+    def stats(self) -> Dict[str, Any]:
+        """Aggregate timing over all non-cached calls so far."""
+        return {
+            "calls": self.calls,
+            "mean_latency": round(self.total_latency / self.calls, 4) if self.calls else None,
+            "mean_ttft": round(self.total_ttft / self.calls, 4) if self.calls else None,
+            "tokens": self.total_tokens,
+            "tokens_per_sec": round(self.total_tokens / self.total_latency, 2) if self.total_latency else None,
+        }
+
+    def _generate(self, payload: Dict[str, Any]):
+        start = time.perf_counter()
+        res = self.session.post(f"{self.base_url}/api/generate", json=payload, timeout=self.timeout)
+        res.raise_for_status()
+        body = res.json()
+        latency = time.perf_counter() - start
+        tokens = body.get("eval_count", 0)
+        eval_s = body.get("eval_duration", 0) / 1e9
+        stats = CallStats(
+            latency=latency,
+            ttft=latency,
+            prompt_tokens=body.get("prompt_eval_count", 0),
+            tokens=tokens,
+            tokens_per_sec=tokens / eval_s if eval_s else 0.0
+        )
+        return body["response"].strip(), stats
+
+    def _generate_first_line(self, payload: Dict[str, Any]):
+        start = time.perf_counter()
+        stats = CallStats()
+        text = ""
+        with self.session.post(
+            f"{self.base_url}/api/generate", json=payload, stream=True, timeout=self.timeout
+        ) as res:
+            res.raise_for_status()
+            for raw in res.iter_lines():
+                if not raw:
+                    continue
+                chunk = json.loads(raw)
+                if stats.tokens == 0:
+                    stats.ttft = time.perf_counter() - start
+                stats.tokens += 1
+                text += chunk.get("response", "")
+                stripped = text.lstrip()
+                if "\n" in stripped:
+                    # closing the stream aborts the rest of the generation
+                    text = stripped.split("\n", 1)[0]
+                    stats.truncated = True
+                    break
+                if chunk.get("done"):
+                    stats.prompt_tokens = chunk.get("prompt_eval_count", 0)
+                    break
+        if stats.truncated:
+            # the count only arrives with the final chunk
+            stats.prompt_tokens = estimate_tokens(payload["prompt"])
+            stats.prompt_tokens_estimated = True
+        stats.latency = time.perf_counter() - start
+        gen_s = stats.latency - stats.ttft
+        stats.tokens_per_sec = stats.tokens / gen_s if gen_s > 0 else 0.0
+        return text.strip(), stats
+
+    def _record(self, stats: CallStats) -> None:
+        self.last_stats = stats
+        self.calls += 1
+        self.total_latency += stats.latency
+        self.total_ttft += stats.ttft
+        self.total_tokens += stats.tokens
+        if self.metrics is not None:
+            self.metrics.record("llm.call", stats.latency)
+            self.metrics.record("llm.ttft", stats.ttft)
+            self.metrics.incr("llm.calls")
+            self.metrics.incr("llm.prompt_tokens", stats.prompt_tokens)
+            if stats.prompt_tokens_estimated:
+                self.metrics.incr("llm.prompt_tokens_estimated", stats.prompt_tokens)
+            self.metrics.incr("llm.completion_tokens", stats.tokens)